@@ -0,0 +1,290 @@
+import argparse
+import json
+import numpy as np
+import os
+import random
+import subprocess
+import time
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from strategies.base_strategy import ENGINES, MAX_SEARCH_DEPTH
+from strategies.memory_store import find_shards, merge_memory_shards, shard_path
+from strategies.memory_strategy import MemoryStrategy
+from strategies.ntuple_strategy import NTupleStrategy
+from strategies.simple_strategy import SimpleStrategy
+from threes_env import ThreesEnv
+
+
+STRATEGIES = {
+    'simple': SimpleStrategy,
+    'memory': MemoryStrategy,
+    'ntuple': NTupleStrategy
+}
+
+_worker_strategy = None
+
+
+def create_strategy(name, engine='numpy', memory_file=None, learn=False, memory_weights=None):
+    if name != 'memory':
+        return STRATEGIES[name](debug=False, engine=engine)
+
+    memory_shard = shard_path(memory_file, os.getpid()) if learn else None
+    return STRATEGIES[name](
+        debug=False, engine=engine, memory_file=memory_file, memory_shard=memory_shard, weights_file=memory_weights
+    )
+
+
+def _init_worker(strategy_name, engine, memory_file=None, learn=False, memory_weights=None):
+    global _worker_strategy
+    _worker_strategy = create_strategy(strategy_name, engine, memory_file, learn, memory_weights)
+
+
+def play_headless_game(strategy, seed, depth=None, move_budget_ms=None, max_moves=None, learn=False):
+    random.seed(seed)
+    env = ThreesEnv(seed=seed)
+    board, next_tile = env.reset()
+
+    latencies = []
+    illegal_move = False
+    start_time = time.perf_counter()
+
+    while not env.done and (max_moves is None or env.move_count < max_moves):
+        move_start = time.perf_counter()
+
+        if move_budget_ms is not None:
+            deadline = move_start + move_budget_ms / 1000
+            _, direction = strategy.find_best_move(board, next_tile, depth=MAX_SEARCH_DEPTH, deadline=deadline)
+        else:
+            search_depth = depth or (4 if np.sum(board == 0) <= 4 else 2)
+            _, direction = strategy.find_best_move(board, next_tile, depth=search_depth)
+
+        latencies.append(time.perf_counter() - move_start)
+
+        score_before = strategy.evaluate_position(board) if learn else 0
+        new_board, new_next_tile, _, info = env.step(direction)
+        if not info['moved']:
+            if learn:
+                strategy.remember_failed_move(board, next_tile, direction)
+            illegal_move = True
+            break
+
+        if learn:
+            strategy.record_move(
+                board, next_tile, direction, new_board,
+                score_before, strategy.evaluate_position(new_board), env.move_count
+            )
+        board, next_tile = new_board, new_next_tile
+
+    if learn:
+        strategy.save_memory()
+
+    return {
+        'seed': seed,
+        'max_tile': env.max_tile(),
+        'score': env.score(),
+        'moves': env.move_count,
+        'illegal_move': illegal_move,
+        'truncated': not env.done,
+        'wall_time': time.perf_counter() - start_time,
+        'latencies': latencies
+    }
+
+
+def _play_game_task(seed, depth, move_budget_ms, max_moves, learn):
+    return play_headless_game(_worker_strategy, seed, depth, move_budget_ms, max_moves, learn)
+
+
+def percentile_ms(values, q):
+    if not values:
+        return 0.0
+    return float(np.percentile(values, q) * 1000)
+
+
+def summarize(game_results, elapsed):
+    latencies = [latency for result in game_results for latency in result['latencies']]
+    total_moves = sum(result['moves'] for result in game_results)
+    max_tiles = Counter(result['max_tile'] for result in game_results)
+
+    return {
+        'games': len(game_results),
+        'total_moves': total_moves,
+        'illegal_moves': sum(result['illegal_move'] for result in game_results),
+        'truncated': sum(result['truncated'] for result in game_results),
+        'elapsed_sec': elapsed,
+        'games_per_hour': len(game_results) / elapsed * 3600 if elapsed > 0 else 0.0,
+        'moves_per_sec': total_moves / elapsed if elapsed > 0 else 0.0,
+        'max_tile_distribution': {str(tile): max_tiles[tile] for tile in sorted(max_tiles)},
+        'mean_score': float(np.mean([result['score'] for result in game_results])) if game_results else 0.0,
+        'latency_ms': {
+            'mean': float(np.mean(latencies) * 1000) if latencies else 0.0,
+            'p50': percentile_ms(latencies, 50),
+            'p95': percentile_ms(latencies, 95),
+            'p99': percentile_ms(latencies, 99),
+            'max': float(np.max(latencies) * 1000) if latencies else 0.0
+        }
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(strategy_name='memory', games=10, workers=1, seed=0, depth=None, move_budget_ms=None,
+                  engine='numpy', max_moves=None, memory_file=None, learn_memory_file=None, memory_weights=None):
+    seeds = [seed + k for k in range(games)]
+    learn = learn_memory_file is not None
+    if learn:
+        memory_file = learn_memory_file
+
+    if learn and os.path.dirname(learn_memory_file):
+        os.makedirs(os.path.dirname(learn_memory_file), exist_ok=True)
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker,
+        initargs=(strategy_name, engine, memory_file, learn, memory_weights)
+    ) as executor:
+        game_results = list(executor.map(
+            _play_game_task, seeds,
+            [depth] * games, [move_budget_ms] * games, [max_moves] * games, [learn] * games
+        ))
+    elapsed = time.perf_counter() - start_time
+
+    if learn:
+        shards = find_shards(learn_memory_file)
+        inputs = [learn_memory_file] + shards if os.path.exists(learn_memory_file) else shards
+        states = merge_memory_shards(inputs, learn_memory_file)
+        for shard in shards:
+            os.remove(shard)
+        print(f'Merged {len(shards)} memory shards into {learn_memory_file} ({states} states)')
+
+    return {
+        'config': {
+            'strategy': strategy_name,
+            'engine': engine,
+            'games': games,
+            'workers': workers,
+            'seed': seed,
+            'depth': depth,
+            'move_budget_ms': move_budget_ms,
+            'max_moves': max_moves,
+            'memory_file': memory_file,
+            'learn_memory_file': learn_memory_file,
+            'memory_weights': memory_weights
+        },
+        'git_commit': get_git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'summary': summarize(game_results, elapsed),
+        'games': [
+            {key: value for key, value in result.items() if key != 'latencies'}
+            for result in game_results
+        ]
+    }
+
+
+def print_summary(results):
+    summary = results['summary']
+
+    print('=== BENCHMARK RESULTS ===')
+    print(f"Strategy: {results['config']['strategy']} ({results['config']['engine']} engine)")
+    print(f"Games: {summary['games']} on {results['config']['workers']} workers in {summary['elapsed_sec']:.1f} sec")
+    print(f"Games/hour: {summary['games_per_hour']:.0f}")
+    print(f"Moves/sec: {summary['moves_per_sec']:.1f}")
+    print(f"Mean score: {summary['mean_score']:.0f}")
+    if summary['truncated']:
+        print(f"Truncated games: {summary['truncated']} ({summary['illegal_moves']} ended by an illegal move)")
+
+    print('\nMax tile distribution:')
+    for tile, count in summary['max_tile_distribution'].items():
+        print(f'{tile:>6}: {count}')
+
+    latency = summary['latency_ms']
+    print('\nfind_best_move latency:')
+    print(f"p50: {latency['p50']:.2f} ms, p95: {latency['p95']:.2f} ms, p99: {latency['p99']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Threes self-play benchmark')
+    parser.add_argument(
+        '-s', '--strategy', choices=list(STRATEGIES), default='memory',
+        help='Strategy to benchmark (default: memory)')
+    parser.add_argument(
+        '-e', '--engine', choices=ENGINES, default='numpy',
+        help='Move simulation engine (default: numpy)')
+    parser.add_argument(
+        '-n', '--games', type=int, default=10,
+        help='Number of games to play (default: 10)')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=os.cpu_count() or 1,
+        help='Worker processes (default: CPU count)')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed of the first game, game k uses seed + k (default: 0)')
+    parser.add_argument(
+        '--depth', type=int, default=None,
+        help="Fixed search depth (default: the solver's adaptive depth)")
+    parser.add_argument(
+        '-b', '--move-budget-ms', type=int, default=None,
+        help='Per-move search budget for iterative deepening (default: fixed depth)')
+    parser.add_argument(
+        '--max-moves', type=int, default=None,
+        help='Stop each game after this many moves (default: play to the end)')
+    parser.add_argument(
+        '--memory-file', default=None,
+        help='Memory file the memory strategy takes advice from, read-only (default: none, play without memory)')
+    parser.add_argument(
+        '--memory-weights', default=None,
+        help='Phase weights file of the memory strategy, from tune_weights.py (default: none, built-in weights)')
+    parser.add_argument(
+        '--learn', default=None, metavar='MEMORY_FILE',
+        help='Record every move into this .npy memory file: each worker writes its own shard and the shards '
+             'are merged into the file after the run (memory strategy only)')
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='JSON results file (default: ./benchmark_results/benchmark_<timestamp>.json)')
+
+    args = parser.parse_args()
+
+    if args.learn is not None:
+        if args.strategy != 'memory':
+            parser.error('--learn needs --strategy memory')
+        if not args.learn.endswith('.npy'):
+            parser.error(f'--learn needs a .npy memory file, got: {args.learn}')
+    if args.memory_file is not None and args.strategy != 'memory':
+        parser.error('--memory-file needs --strategy memory')
+    if args.memory_weights is not None and args.strategy != 'memory':
+        parser.error('--memory-weights needs --strategy memory')
+    if args.memory_weights is not None and not os.path.exists(args.memory_weights):
+        parser.error(f'Memory weights file not found: {args.memory_weights}')
+
+    results = run_benchmark(
+        strategy_name=args.strategy, games=args.games, workers=args.workers, seed=args.seed,
+        depth=args.depth, move_budget_ms=args.move_budget_ms, engine=args.engine, max_moves=args.max_moves,
+        memory_file=args.memory_file, learn_memory_file=args.learn, memory_weights=args.memory_weights
+    )
+
+    print_summary(results)
+
+    output = args.output
+    if output is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join('./benchmark_results', f'benchmark_{timestamp}.json')
+
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f'\nResults saved to: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,20 +3,68 @@ import json
 import numpy as np
 import os
 import time
+import zlib
 
+from capture_backends import create_capture_backend
 from datetime import datetime
-from PIL import ImageGrab
+
+
+COLOR_LUT_FILE = 'color_lut.npy'
+COLOR_LUT_LEVELS = 32
+MATCH_THRESHOLD = 40
+EMPTY_BRIGHTNESS = 240
+
+
+def palette_arrays(tile_colors):
+    palette_values = np.array([int(value) for value in tile_colors], dtype=int)
+    palette_colors = np.array(
+        [color_data['average'] for color_data in tile_colors.values()], dtype=float
+    ).reshape(-1, 3)
+    return palette_values, palette_colors
+
+
+def classify_palette(avg_colors, palette_values, palette_colors):
+    distances = np.linalg.norm(avg_colors[:, None, :] - palette_colors[None, :, :], axis=2)
+    best = np.argmin(distances, axis=1)
+    min_distances = distances[np.arange(len(avg_colors)), best]
+
+    values = palette_values[best]
+    values[min_distances > MATCH_THRESHOLD] = 0
+    values[np.mean(avg_colors, axis=1) > EMPTY_BRIGHTNESS] = 0
+
+    return values, min_distances
+
+
+def build_color_lut(tile_colors, levels=COLOR_LUT_LEVELS):
+    step = 256 // levels
+    centers = np.arange(levels) * step + (step - 1) / 2
+    b, g, r = np.meshgrid(centers, centers, centers, indexing='ij')
+    colors = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1)
+
+    values, _ = classify_palette(colors, *palette_arrays(tile_colors))
+
+    return values.astype(np.uint16).reshape(levels, levels, levels)
 
 
 class BoardParser:
-    def __init__(self, calibration_dir='calibration', debug=True):
+    def __init__(self, calibration_dir='calibration', debug=True, capture_backend=None, scale_factor=None):
         self._calibration_dir = calibration_dir
         self._debug = debug
+        self._capture_backend = 'pil'
         self._board_region = None
         self._next_tile_region = None
+        self._frame_region = None
+        self._board_view = None
+        self._next_tile_view = None
         self._tile_colors = {}
         self._scale_factor = 0.5
 
+        self._palette_values = None
+        self._palette_colors = None
+        self._color_lut = None
+        self._color_lut_shift = None
+        self._cell_centers = None
+
         self._tile_width = None
         self._tile_height = None
         self._gap_x = None
@@ -29,10 +77,20 @@ class BoardParser:
 
         self.load_calibration_data()
 
+        if scale_factor is not None:
+            self._scale_factor = scale_factor
+            self._build_frame_views()
+            self._build_cell_centers()
+
+        self._capture = create_capture_backend(capture_backend or self._capture_backend)
+
     def _adjust_region_for_retina(self, region):
         if region is None:
             return None
 
+        if self._scale_factor == 1:
+            return tuple(region)
+
         left, top, right, bottom = region
         scaled_region = (
             int(left * self._scale_factor),
@@ -61,6 +119,8 @@ class BoardParser:
             self._board_region = tuple(calibration_data['board_region'])
             self._next_tile_region = tuple(calibration_data['next_tile_region'])
             self._tile_colors = calibration_data['tile_colors']
+            self._capture_backend = calibration_data.get('capture_backend', self._capture_backend)
+            self._scale_factor = calibration_data.get('scale_factor', self._scale_factor)
 
             if 'grid_params' in calibration_data:
                 grid_params = calibration_data['grid_params']
@@ -70,6 +130,11 @@ class BoardParser:
                 self._gap_y = grid_params['gap_y']
                 self._tile_positions = grid_params['tile_positions']
 
+            self._build_frame_views()
+            self._build_palette()
+            self._load_color_lut(filepath)
+            self._build_cell_centers()
+
             if self._debug:
                 print('Calibration data loaded successfully')
                 if self._tile_positions:
@@ -82,6 +147,102 @@ class BoardParser:
         except Exception as e:
             raise Exception(f'Error loading calibration data: {e}')
 
+    def _build_frame_views(self):
+        self._frame_region = (
+            min(self._board_region[0], self._next_tile_region[0]),
+            min(self._board_region[1], self._next_tile_region[1]),
+            max(self._board_region[2], self._next_tile_region[2]),
+            max(self._board_region[3], self._next_tile_region[3])
+        )
+
+        frame_left = int(self._frame_region[0] * self._scale_factor)
+        frame_top = int(self._frame_region[1] * self._scale_factor)
+
+        views = []
+        for left, top, right, bottom in [self._board_region, self._next_tile_region]:
+            views.append((
+                slice(int(top * self._scale_factor) - frame_top, int(bottom * self._scale_factor) - frame_top),
+                slice(int(left * self._scale_factor) - frame_left, int(right * self._scale_factor) - frame_left)
+            ))
+
+        self._board_view, self._next_tile_view = views
+
+    def _build_palette(self):
+        self._palette_values, self._palette_colors = palette_arrays(self._tile_colors)
+
+    def _load_color_lut(self, calibration_file):
+        lut_file = os.path.join(self._calibration_dir, COLOR_LUT_FILE)
+
+        if os.path.exists(lut_file) and os.path.getmtime(lut_file) >= os.path.getmtime(calibration_file):
+            self._color_lut = np.load(lut_file, mmap_mode='r')
+        else:
+            self._color_lut = build_color_lut(self._tile_colors)
+            try:
+                np.save(lut_file, self._color_lut)
+            except OSError as e:
+                if self._debug:
+                    print(f'Color LUT save error: {e}')
+
+        self._color_lut_shift = int(np.log2(256 // self._color_lut.shape[0]))
+
+    def _build_cell_centers(self):
+        if not self._tile_positions:
+            self._cell_centers = None
+            return
+
+        centers = []
+        for i in range(4):
+            for j in range(4):
+                tile_left, tile_top, tile_right, tile_bottom = self._tile_positions[i][j]
+
+                scaled_left = int(tile_left * self._scale_factor)
+                scaled_top = int(tile_top * self._scale_factor)
+                scaled_right = int(tile_right * self._scale_factor)
+                scaled_bottom = int(tile_bottom * self._scale_factor)
+
+                h = scaled_bottom - scaled_top
+                w = scaled_right - scaled_left
+                margin_h = int(h * 0.1)
+                margin_w = int(w * 0.1)
+
+                centers.append((
+                    scaled_top + margin_h, scaled_bottom - margin_h,
+                    scaled_left + margin_w, scaled_right - margin_w
+                ))
+
+        self._cell_centers = np.array(centers, dtype=int)
+
+    def cell_colors(self, board_img, cells):
+        colors = np.empty((len(cells), 3))
+
+        for k, (i, j) in enumerate(cells):
+            top, bottom, left, right = self._cell_centers[4 * i + j]
+            colors[k] = cv2.mean(board_img[top:bottom, left:right])[:3]
+
+        return colors
+
+    def cell_center_colors(self, board_img):
+        h, w = board_img.shape[:2]
+        top = np.clip(self._cell_centers[:, 0], 0, h)
+        bottom = np.clip(self._cell_centers[:, 1], 0, h)
+        left = np.clip(self._cell_centers[:, 2], 0, w)
+        right = np.clip(self._cell_centers[:, 3], 0, w)
+
+        integral = cv2.integral(np.ascontiguousarray(board_img[:, :, :3]))
+        sums = integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left]
+        area = np.maximum((bottom - top) * (right - left), 1)
+
+        return sums / area[:, None]
+
+    def classify_colors(self, avg_colors):
+        if self._color_lut is None:
+            return classify_palette(avg_colors, self._palette_values, self._palette_colors)
+
+        quantized = avg_colors.astype(int) >> self._color_lut_shift
+        values = self._color_lut[quantized[:, 0], quantized[:, 1], quantized[:, 2]].astype(int)
+
+        return values, None
+
     def countdown_timer(self, seconds):
         print(f'Starting in {seconds} seconds... Switch to the game window!')
         for i in range(seconds, 0, -1):
@@ -97,20 +258,26 @@ class BoardParser:
                 left, top, right, bottom = adjusted_region
                 if left >= right or top >= bottom:
                     raise ValueError(f'Invalid region: {adjusted_region}')
-                screenshot = ImageGrab.grab(bbox=adjusted_region)
-            else:
-                screenshot = ImageGrab.grab()
 
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            img = self._capture.grab(adjusted_region)
 
             if filename and self._debug:
                 filepath = os.path.join(self._debug_dir, filename)
                 cv2.imwrite(filepath, img)
                 print(f'Screenshot saved: {filepath}')
             return img
+        except EOFError:
+            raise
         except Exception as e:
             raise Exception(f'Error capturing screenshot of region {adjusted_region}: {e}')
 
+    def capture_frame(self):
+        frame = self.get_screenshot(self._frame_region)
+        return frame[self._board_view], frame[self._next_tile_view]
+
+    def close(self):
+        self._capture.close()
+
     def draw_region(self, image, region, color=(0, 255, 0), thickness=2, label=None):
         x1, y1, x2, y2 = region
         cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
@@ -199,78 +366,177 @@ class BoardParser:
         margin_w = int(w * 0.1)
         center_region = cell_image[margin_h:h-margin_h, margin_w:w-margin_w]
 
-        avg_color = np.mean(center_region, axis=(0, 1))
+        avg_color = np.array(cv2.mean(center_region)[:3])
 
-        if np.mean(avg_color) > 240:
-            return 0
+        values, _ = self.classify_colors(avg_color[None, :])
 
-        best_match = 0
-        min_distance = float('inf')
+        if self._debug and position:
+            print(f'Cell {position}: recognized as {values[0]}')
 
-        for value, color_data in self._tile_colors.items():
-            if value == 0:
-                continue
+        return int(values[0])
 
-            target_color = np.array(color_data['average'])
-            distance = np.linalg.norm(avg_color - target_color)
+    def parse_board(self, board_img=None):
+        if not self._board_region:
+            raise ValueError('Game board region is not set!')
 
-            if distance < min_distance:
-                min_distance = distance
-                best_match = value
+        if not self._tile_positions:
+            raise ValueError('Tile grid parameters are not set! Run calibration first.')
 
-        threshold = 40
+        start_time = time.time()
 
-        if min_distance > threshold:
-            if self._debug and position:
-                print(f'Cell {position}: no good match (min distance {min_distance}), returning 0')
-            return 0
+        if board_img is None:
+            board_img = self.get_screenshot(self._board_region)
 
-        if self._debug and position:
-            print(f'Cell {position}: recognized as {best_match} (distance {min_distance})')
+        values, _ = self.classify_colors(self.cell_center_colors(board_img))
+        board = values.reshape(4, 4)
 
-        return best_match
+        if self._debug:
+            for cell in range(16):
+                print(f'Cell {divmod(cell, 4)}: recognized as {values[cell]}')
 
-    def parse_board(self):
-        if not self._board_region:
-            raise ValueError('Game board region is not set!')
+        parse_time = time.time() - start_time
 
-        if not self._tile_positions:
-            raise ValueError('Tile grid parameters are not set! Run calibration first.')
+        return board, parse_time
 
+    def parse_board_predicted(self, previous_board, predicted_board, spawn_positions, board_img=None):
         start_time = time.time()
 
-        board_img = self.get_screenshot(self._board_region)
-        board = np.zeros((4, 4), dtype=int)
+        if board_img is None:
+            board_img = self.get_screenshot(self._board_region)
 
-        for i in range(4):
-            for j in range(4):
-                tile_left, tile_top, tile_right, tile_bottom = self._tile_positions[i][j]
+        changed_cells = [tuple(cell) for cell in np.argwhere(predicted_board != previous_board)]
+        spawn_positions = [tuple(cell) for cell in spawn_positions]
+        cells = changed_cells + [cell for cell in spawn_positions if cell not in changed_cells]
 
-                scaled_left = int(tile_left * self._scale_factor)
-                scaled_top = int(tile_top * self._scale_factor)
-                scaled_right = int(tile_right * self._scale_factor)
-                scaled_bottom = int(tile_bottom * self._scale_factor)
+        values, _ = self.classify_colors(self.cell_colors(board_img, cells))
+        observed = dict(zip(cells, values))
 
-                cell_img = board_img[scaled_top:scaled_bottom, scaled_left:scaled_right]
-                board[i, j] = self.recognize_tile_value(cell_img, (i, j))
+        spawned = [cell for cell in spawn_positions if observed[cell] != 0]
+        matched = (
+            all(observed[cell] == predicted_board[cell] for cell in cells if cell not in spawn_positions)
+            and len(spawned) == 1
+            and all(predicted_board[cell] == 0 for cell in spawn_positions)
+        )
+
+        if matched:
+            board = predicted_board.copy()
+            board[spawned[0]] = observed[spawned[0]]
+        else:
+            if self._debug:
+                print(f'Prediction mismatch on {len(cells)} checked cells, parsing the full board')
+            board, _ = self.parse_board(board_img)
 
         parse_time = time.time() - start_time
 
-        return board, parse_time
+        return board, matched, parse_time
 
-    def parse_next_tile(self):
+    def parse_next_tile(self, next_tile_img=None):
         if not self._next_tile_region:
             raise ValueError('Next tile region is not set!')
 
         start_time = time.time()
 
-        next_tile_img = self.get_screenshot(self._next_tile_region)
+        if next_tile_img is None:
+            next_tile_img = self.get_screenshot(self._next_tile_region)
         next_tile_value = self.recognize_tile_value(next_tile_img, 'next_tile')
 
         parse_time = time.time() - start_time
 
         return next_tile_value, parse_time
 
+    def board_signature(self, board_img=None, size=16):
+        if board_img is None:
+            board_img = self.get_screenshot(self._board_region)
+        thumbnail = cv2.resize(board_img, (size, size), interpolation=cv2.INTER_AREA)
+        return zlib.crc32(thumbnail >> 4)
+
+    def wait_for_settle(self, before_signature=None, stable_frames=3, timeout=1.0, poll_interval=0.005):
+        region = self._adjust_region_for_retina(self._board_region)
+        start_time = time.perf_counter()
+        changed = before_signature is None
+        last_signature = None
+        stable = 0
+        board_img = None
+
+        while time.perf_counter() - start_time < timeout:
+            board_img = self._capture.grab(region)
+            signature = self.board_signature(board_img)
+
+            if not changed:
+                if signature != before_signature:
+                    changed = True
+                    stable = 1
+            elif signature == last_signature:
+                stable += 1
+            else:
+                stable = 1
+
+            if changed and stable >= stable_frames:
+                return True, board_img, time.perf_counter() - start_time
+
+            last_signature = signature
+            time.sleep(poll_interval)
+
+        return False, board_img, time.perf_counter() - start_time
+
+    def parse_frame(self):
+        start_time = time.time()
+
+        board_img, next_tile_img = self.capture_frame()
+        board, _ = self.parse_board(board_img)
+        next_tile, _ = self.parse_next_tile(next_tile_img)
+
+        parse_time = time.time() - start_time
+
+        return board, next_tile, parse_time
+
+    def replay(self, labels=None, max_frames=None):
+        frames = 0
+        labeled = 0
+        board_matches = 0
+        next_tile_matches = 0
+        mismatches = []
+
+        start_time = time.perf_counter()
+
+        while max_frames is None or frames < max_frames:
+            try:
+                board, next_tile, _ = self.parse_frame()
+            except EOFError:
+                break
+
+            frames += 1
+            frame_name = self._capture.frame_name
+
+            if labels and frame_name in labels:
+                labeled += 1
+                expected = labels[frame_name]
+                board_match = np.array_equal(board, expected['board'])
+                next_tile_match = next_tile == expected['next_tile']
+
+                board_matches += board_match
+                next_tile_matches += next_tile_match
+
+                if not (board_match and next_tile_match):
+                    mismatches.append({
+                        'frame': frame_name,
+                        'board': board.tolist(),
+                        'next_tile': int(next_tile),
+                        'expected': expected
+                    })
+
+        elapsed = time.perf_counter() - start_time
+
+        return {
+            'frames': frames,
+            'elapsed_sec': elapsed,
+            'frames_per_sec': frames / elapsed if elapsed > 0 else 0.0,
+            'labeled_frames': labeled,
+            'board_accuracy': board_matches / labeled if labeled else None,
+            'next_tile_accuracy': next_tile_matches / labeled if labeled else None,
+            'mismatches': mismatches
+        }
+
     def print_board_text(self, board):
         print('+' + '------+' * 4)
         for i in range(4):
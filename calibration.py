@@ -4,11 +4,15 @@ import numpy as np
 import os
 import time
 
-from PIL import ImageGrab
+from board_parser import COLOR_LUT_FILE, build_color_lut
+from capture_backends import create_capture_backend
 
 
 class Calibrator:
-    def __init__(self):
+    def __init__(self, capture_backend='pil', scale_factor=0.5):
+        self._capture_backend = capture_backend
+        self._capture = create_capture_backend(capture_backend)
+        self._scale_factor = scale_factor
         self._board_region = None
         self._next_tile_region = None
         self._tile_colors = {}
@@ -36,12 +40,7 @@ class Calibrator:
         print('Go!')
 
     def get_screenshot(self, region=None, filename=None):
-        if region:
-            screenshot = ImageGrab.grab(bbox=region)
-        else:
-            screenshot = ImageGrab.grab()
-
-        img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        img = self._capture.grab(region).copy()
 
         if filename:
             filepath = os.path.join(self._calibration_dir, filename)
@@ -372,7 +371,9 @@ class Calibrator:
             'board_region': self._board_region,
             'next_tile_region': self._next_tile_region,
             'tile_colors': self._tile_colors,
-            'grid_params': grid_params
+            'grid_params': grid_params,
+            'capture_backend': self._capture_backend,
+            'scale_factor': self._scale_factor
         }
 
         filepath = os.path.join(self._calibration_dir, 'calibration_data.json')
@@ -381,6 +382,11 @@ class Calibrator:
 
         print(f'Calibration data saved to: {filepath}')
 
+        lut_filepath = os.path.join(self._calibration_dir, COLOR_LUT_FILE)
+        np.save(lut_filepath, build_color_lut(self._tile_colors))
+
+        print(f'Color lookup table saved to: {lut_filepath}')
+
     def load_calibration_data(self):
         filepath = os.path.join(self._calibration_dir, 'calibration_data.json')
 
@@ -0,0 +1,189 @@
+import cv2
+import glob
+import numpy as np
+import os
+import time
+
+from PIL import ImageGrab
+
+
+class PILCapture:
+    name = 'pil'
+
+    def grab(self, region=None):
+        screenshot = ImageGrab.grab(bbox=region) if region else ImageGrab.grab()
+        return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+
+    def close(self):
+        pass
+
+
+class MSSCapture:
+    name = 'mss'
+
+    def __init__(self):
+        try:
+            import mss
+        except ImportError:
+            raise ImportError('The mss capture backend needs the mss package: pip install mss')
+
+        self._sct = mss.mss()
+        self._buffers = {}
+
+    def grab(self, region=None):
+        if region:
+            left, top, right, bottom = region
+            monitor = {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+        else:
+            monitor = self._sct.monitors[0]
+
+        screenshot = self._sct.grab(monitor)
+        bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+        size = (monitor['height'], monitor['width'])
+        buffer = self._buffers.get(size)
+        if buffer is None:
+            buffer = self._buffers[size] = np.empty((*size, 3), dtype=np.uint8)
+
+        if bgra.shape[:2] == size:
+            np.copyto(buffer, bgra[:, :, :3])
+        else:
+            cv2.resize(bgra[:, :, :3], (size[1], size[0]), dst=buffer, interpolation=cv2.INTER_AREA)
+
+        return buffer
+
+    def close(self):
+        self._sct.close()
+
+
+class ReplayCapture:
+    name = 'replay'
+
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, path, fps=None, loop=False, preload=False):
+        self._path = path
+        self._fps = fps
+        self._loop = loop
+        self._video = None
+        self._files = None
+        self._frames = None
+        self._position = 0
+        self._index = 0
+        self._frame_name = None
+        self._last_grab_time = None
+
+        if os.path.isdir(path):
+            self._files = sorted(
+                file for file in glob.glob(os.path.join(path, '*')) if file.lower().endswith(self.IMAGE_EXTENSIONS)
+            )
+        elif path.lower().endswith(self.IMAGE_EXTENSIONS) or any(char in path for char in '*?['):
+            self._files = sorted(glob.glob(path))
+        else:
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f'Cannot open replay video: {path}')
+
+        if self._files is not None and not self._files:
+            raise ValueError(f'No replay frames found: {path}')
+
+        if preload:
+            self._frames = []
+            while True:
+                try:
+                    self._frames.append(self._read_frame())
+                except EOFError:
+                    break
+            self._position = 0
+
+    @property
+    def frame_name(self):
+        return self._frame_name
+
+    @property
+    def frames_read(self):
+        return self._index
+
+    def __len__(self):
+        if self._frames is not None:
+            return len(self._frames)
+        if self._files is not None:
+            return len(self._files)
+        return int(self._video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _read_frame(self):
+        if self._files is not None:
+            if self._position >= len(self._files):
+                raise EOFError(f'Replay exhausted after {self._index} frames')
+
+            file = self._files[self._position]
+            frame = cv2.imread(file)
+            if frame is None:
+                raise ValueError(f'Cannot read replay frame: {file}')
+            name = os.path.basename(file)
+        else:
+            ok, frame = self._video.read()
+            if not ok:
+                raise EOFError(f'Replay exhausted after {self._index} frames')
+            name = f'frame_{self._position:06d}'
+
+        self._position += 1
+        return name, frame
+
+    def _rewind(self):
+        self._position = 0
+        if self._video is not None and self._frames is None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def next_frame(self):
+        if self._frames is not None:
+            if self._position >= len(self._frames):
+                if not self._loop:
+                    raise EOFError(f'Replay exhausted after {self._index} frames')
+                self._rewind()
+            name, frame = self._frames[self._position]
+            self._position += 1
+        else:
+            try:
+                name, frame = self._read_frame()
+            except EOFError:
+                if not self._loop:
+                    raise
+                self._rewind()
+                name, frame = self._read_frame()
+
+        self._frame_name = name
+        self._index += 1
+        return frame
+
+    def grab(self, region=None):
+        if self._fps and self._last_grab_time is not None:
+            delay = self._last_grab_time + 1 / self._fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._last_grab_time = time.perf_counter()
+
+        frame = self.next_frame()
+
+        if region:
+            left, top, right, bottom = region
+            return frame[top:bottom, left:right]
+        return frame
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+
+CAPTURE_BACKENDS = {
+    'pil': PILCapture,
+    'mss': MSSCapture
+}
+
+
+def create_capture_backend(name='pil'):
+    if not isinstance(name, str):
+        return name
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f'Unknown capture backend: {name}. Available: {list(CAPTURE_BACKENDS)}')
+    return CAPTURE_BACKENDS[name]()
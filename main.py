@@ -1,10 +1,15 @@
 import argparse
+import json
 
 from board_parser import BoardParser
 from calibration import Calibrator
+from capture_backends import CAPTURE_BACKENDS, ReplayCapture
 from solver import ThreesSolver
+from strategies.base_strategy import ENGINES
 from strategies.simple_strategy import SimpleStrategy
-from strategies.memory_strategy import MemoryStrategy
+from strategies.memory_strategy import MEMORY_WEIGHTS_FILE, MemoryStrategy
+from strategies.ntuple_strategy import NTUPLE_WEIGHTS_FILE, NTupleStrategy
+from threes_env import ThreesEnv
 
 
 def main():
@@ -16,31 +21,139 @@ def main():
     parser.add_argument(
         '-d', '--debug', action='store_true', help='Enable debug output')
     parser.add_argument(
-        '-s', '--strategy', choices=['simple', 'memory'], default='simple',
+        '-s', '--strategy', choices=['simple', 'memory', 'ntuple'], default='simple',
         help='Strategy to use (default: simple)')
+    parser.add_argument(
+        '-e', '--engine', choices=ENGINES, default='numpy',
+        help='Move simulation engine (default: numpy)')
     parser.add_argument(
         '-g', '--games', type=int, default=None,
         help='Maximum number of games to play (default: unlimited)')
     parser.add_argument(
         '-t', '--target', type=int, default=384,
         help='Target tile value to reach (default: 384)')
+    parser.add_argument(
+        '-b', '--move-budget-ms', type=int, default=None,
+        help='Search each move with iterative deepening until this many milliseconds pass '
+             '(default: fixed depth)')
+    parser.add_argument(
+        '-w', '--search-workers', type=int, default=0,
+        help='Worker processes for root-parallel search in the memory strategy (default: 0, serial)')
+    parser.add_argument(
+        '--ntuple-weights', default=NTUPLE_WEIGHTS_FILE,
+        help=f'Weights file of the ntuple strategy, trained with train_ntuple.py (default: {NTUPLE_WEIGHTS_FILE})')
+    parser.add_argument(
+        '--memory-file', default='./memory/game_memory.sqlite',
+        help='Memory file of the memory strategy: .sqlite, .npy (memory-mapped) or .json. An empty .sqlite or .npy '
+             'file first imports the legacy <name>.json next to it (default: ./memory/game_memory.sqlite)')
+    parser.add_argument(
+        '--memory-weights', default=MEMORY_WEIGHTS_FILE,
+        help=f'Phase weights file of the memory strategy, tuned with tune_weights.py. Built-in weights are used '
+             f'when it does not exist (default: {MEMORY_WEIGHTS_FILE})')
+    parser.add_argument(
+        '--memory-max-states', type=int, default=1 << 18,
+        help='States the memory strategy keeps in RAM before evicting the least visited (default: 262144, '
+             '0 for unbounded)')
+    parser.add_argument(
+        '--headless', action='store_true',
+        help='Play against the built-in Threes simulator instead of the emulator')
+    parser.add_argument(
+        '--seed', type=int, default=None,
+        help='Random seed for the headless simulator (default: random)')
+    parser.add_argument(
+        '--capture-backend', choices=list(CAPTURE_BACKENDS), default=None,
+        help='Screen capture backend (default: the calibrated backend, or pil)')
+    parser.add_argument(
+        '--scale-factor', type=float, default=None,
+        help='Ratio of capture coordinates to calibration screenshot pixels, 0.5 on Retina displays '
+             '(default: the calibrated value, or 0.5)')
+    parser.add_argument(
+        '--settle', action='store_true',
+        help='After each move poll the board until it has changed and stayed stable, instead of fixed sleeps')
+    parser.add_argument(
+        '--settle-frames', type=int, default=3,
+        help='Identical consecutive frames that count as settled (default: 3)')
+    parser.add_argument(
+        '--settle-timeout-ms', type=int, default=1000,
+        help='Give up waiting for the board to settle after this many milliseconds (default: 1000)')
+    parser.add_argument(
+        '--predictive-parse', action='store_true',
+        help='After each move only check the cells the simulation predicts changed plus the spawn cells, '
+             'falling back to a full parse on a mismatch')
+    parser.add_argument(
+        '--ponder', action='store_true',
+        help='While the emulator animates, search the likely next positions on a background thread')
+    parser.add_argument(
+        '--replay', default=None,
+        help='Parse recorded full-screen frames (PNG directory, glob or video file) instead of the screen '
+             'and report recognition throughput')
+    parser.add_argument(
+        '--replay-labels', default=None,
+        help='JSON file mapping frame names to {"board": [[...]], "next_tile": n} for accuracy checks')
+    parser.add_argument(
+        '--replay-fps', type=float, default=None,
+        help='Serve replay frames at this rate (default: as fast as possible)')
+    parser.add_argument(
+        '--replay-preload', action='store_true',
+        help='Decode all replay frames up front so throughput measures recognition only')
 
     args = parser.parse_args()
 
     if args.calibrate:
-        Calibrator().calibrate()
+        Calibrator(
+            capture_backend=args.capture_backend or 'pil',
+            scale_factor=args.scale_factor if args.scale_factor is not None else 0.5
+        ).calibrate()
+    elif args.replay:
+        labels = None
+        if args.replay_labels:
+            with open(args.replay_labels, 'r') as f:
+                labels = json.load(f)
+
+        board_parser = BoardParser(
+            debug=args.debug, calibration_dir='./',
+            capture_backend=ReplayCapture(args.replay, fps=args.replay_fps, preload=args.replay_preload),
+            scale_factor=args.scale_factor
+        )
+        results = board_parser.replay(labels)
+        board_parser.close()
+
+        print(f"Frames: {results['frames']} in {results['elapsed_sec']:.2f} sec "
+              f"({results['frames_per_sec']:.1f} frames/sec)")
+        if results['labeled_frames']:
+            print(f"Labeled frames: {results['labeled_frames']}, board accuracy: {results['board_accuracy']:.1%}, "
+                  f"next tile accuracy: {results['next_tile_accuracy']:.1%}")
+            for mismatch in results['mismatches']:
+                print(f"Mismatch in {mismatch['frame']}: {mismatch['board']} / {mismatch['next_tile']}")
     elif args.parse:
         try:
-            BoardParser(debug=True, calibration_dir='./').parse_board_state()
+            BoardParser(
+                debug=True, calibration_dir='./', capture_backend=args.capture_backend, scale_factor=args.scale_factor
+            ).parse_board_state()
         except Exception as e:
             print(f'Parsing error: {e}')
     else:
         if args.strategy == 'simple':
-            strategy = SimpleStrategy(debug=args.debug)
+            strategy = SimpleStrategy(debug=args.debug, engine=args.engine)
         elif args.strategy == 'memory':
-            strategy = MemoryStrategy(debug=args.debug)
+            strategy = MemoryStrategy(
+                debug=args.debug, engine=args.engine, search_workers=args.search_workers,
+                memory_file=args.memory_file, memory_max_states=args.memory_max_states,
+                weights_file=args.memory_weights
+            )
+        elif args.strategy == 'ntuple':
+            strategy = NTupleStrategy(
+                debug=args.debug, engine=args.engine, search_workers=args.search_workers,
+                weights_file=args.ntuple_weights
+            )
 
-        solver = ThreesSolver(strategy=strategy, debug=args.debug)
+        env = ThreesEnv(seed=args.seed) if args.headless else None
+        solver = ThreesSolver(
+            strategy=strategy, debug=args.debug, move_budget_ms=args.move_budget_ms, env=env,
+            capture_backend=args.capture_backend, scale_factor=args.scale_factor,
+            settle=args.settle, settle_frames=args.settle_frames, settle_timeout=args.settle_timeout_ms / 1000,
+            predictive_parse=args.predictive_parse, ponder=args.ponder
+        )
         solver.play(target_score=args.target, max_games=args.games)
 
 
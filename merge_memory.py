@@ -0,0 +1,43 @@
+import argparse
+import os
+
+from strategies.memory_store import find_shards, merge_memory_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge MemoryStrategy shard files into one memory file')
+    parser.add_argument(
+        'memory_file',
+        help='Target .npy memory file; its existing contents are merged in as well')
+    parser.add_argument(
+        'shards', nargs='*',
+        help='Shard files to merge (default: every <memory_file>.shard-*.npy next to the target)')
+    parser.add_argument(
+        '--keep-shards', action='store_true',
+        help='Do not delete the shard files after a successful merge')
+    parser.add_argument(
+        '--chunk-size', type=int, default=1 << 16,
+        help='Records read from each shard at a time (default: 65536)')
+
+    args = parser.parse_args()
+
+    if not args.memory_file.endswith('.npy'):
+        parser.error(f'Shards can only be merged into a .npy memory file, got: {args.memory_file}')
+
+    shards = args.shards or find_shards(args.memory_file)
+    if not shards:
+        print(f'No shards found for {args.memory_file}')
+        return
+
+    inputs = [args.memory_file] + shards if os.path.exists(args.memory_file) else shards
+    states = merge_memory_shards(inputs, args.memory_file, args.chunk_size)
+
+    if not args.keep_shards:
+        for shard in shards:
+            os.remove(shard)
+
+    print(f'Merged {len(shards)} shards into {args.memory_file}: {states} states')
+
+
+if __name__ == '__main__':
+    main()
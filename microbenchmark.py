@@ -0,0 +1,279 @@
+import argparse
+import cv2
+import json
+import numpy as np
+import os
+import sys
+import time
+import tracemalloc
+
+from board_parser import BoardParser
+from strategies.memory_strategy import MemoryStrategy
+from strategies.simple_strategy import SimpleStrategy
+from threes_env import ThreesEnv
+
+
+FIXTURES_DIR = './benchmark_fixtures'
+FIXTURES_FILE = 'fixtures.json'
+
+GAP_COLOR = (190, 200, 205)
+EMPTY_COLOR = (250, 250, 250)
+
+
+def build_board_corpus(seed=0, count=24, stride=6):
+    strategy = SimpleStrategy(debug=False)
+    env = ThreesEnv(seed=seed)
+    corpus = []
+
+    while len(corpus) < count:
+        board, next_tile = env.reset()
+        while not env.done and len(corpus) < count:
+            if env.move_count % stride == 0:
+                corpus.append({'board': board.tolist(), 'next_tile': int(next_tile)})
+            _, direction = strategy.find_best_move(board, next_tile)
+            board, next_tile, _, _ = env.step(direction)
+
+    return corpus
+
+
+def render_board_image(parser, board):
+    left, top, right, bottom = parser._board_region
+    scale = parser._scale_factor
+    width = int(right * scale) - int(left * scale)
+    height = int(bottom * scale) - int(top * scale)
+
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = GAP_COLOR
+
+    for i in range(4):
+        for j in range(4):
+            tile_left, tile_top, tile_right, tile_bottom = parser._tile_positions[i][j]
+            color = render_tile_color(parser, board[i][j])
+            rows = slice(int(tile_top * scale), int(tile_bottom * scale))
+            columns = slice(int(tile_left * scale), int(tile_right * scale))
+            image[rows, columns] = color
+
+    return image
+
+
+def render_next_tile_image(parser, value):
+    left, top, right, bottom = parser._next_tile_region
+    scale = parser._scale_factor
+    width = int(right * scale) - int(left * scale)
+    height = int(bottom * scale) - int(top * scale)
+
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = render_tile_color(parser, value)
+    return image
+
+
+def render_tile_color(parser, value):
+    if value == 0:
+        return EMPTY_COLOR
+    return np.round(parser._tile_colors[str(value)]['average']).astype(np.uint8)
+
+
+def make_fixtures(fixtures_dir=FIXTURES_DIR, calibration_dir='./'):
+    parser = BoardParser(calibration_dir=calibration_dir, debug=False)
+    palette = {int(value) for value in parser._tile_colors} | {0}
+
+    corpus = build_board_corpus()
+    images = []
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    for entry in corpus:
+        if len(images) >= 4:
+            break
+        if not {value for row in entry['board'] for value in row} <= palette:
+            continue
+
+        board_file = f'board_{len(images):02d}.png'
+        next_tile_file = f'next_tile_{len(images):02d}.png'
+        cv2.imwrite(os.path.join(fixtures_dir, board_file), render_board_image(parser, entry['board']))
+        cv2.imwrite(os.path.join(fixtures_dir, next_tile_file), render_next_tile_image(parser, entry['next_tile']))
+
+        images.append({
+            'board_image': board_file,
+            'next_tile_image': next_tile_file,
+            'board': entry['board'],
+            'next_tile': entry['next_tile']
+        })
+
+    fixtures = {'boards': corpus, 'images': images}
+    with open(os.path.join(fixtures_dir, FIXTURES_FILE), 'w') as f:
+        json.dump(fixtures, f, indent=2)
+
+    print(f'Fixtures saved to: {fixtures_dir} ({len(corpus)} boards, {len(images)} images)')
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, FIXTURES_FILE), 'r') as f:
+        fixtures = json.load(f)
+
+    boards = [np.array(entry['board']) for entry in fixtures['boards']]
+    next_tiles = [entry['next_tile'] for entry in fixtures['boards']]
+
+    images = []
+    for entry in fixtures['images']:
+        images.append({
+            'board_image': cv2.imread(os.path.join(fixtures_dir, entry['board_image'])),
+            'next_tile_image': cv2.imread(os.path.join(fixtures_dir, entry['next_tile_image'])),
+            'board': np.array(entry['board']),
+            'next_tile': entry['next_tile']
+        })
+
+    return boards, next_tiles, images
+
+
+def measure(func, items, min_time=0.5):
+    for item in items:
+        func(item)
+
+    calls = 0
+    start_time = time.perf_counter()
+    while True:
+        for item in items:
+            func(item)
+        calls += len(items)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            break
+
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks_before
+
+    return {
+        'ops_per_sec': calls / elapsed,
+        'usec_per_op': elapsed / calls * 1e6,
+        'peak_bytes': peak,
+        'retained_blocks': retained_blocks
+    }
+
+
+def run_microbenchmarks(fixtures_dir=FIXTURES_DIR, calibration_dir='./', min_time=0.5, only=None):
+    boards, next_tiles, images = load_fixtures(fixtures_dir)
+    states = list(zip(boards, next_tiles))
+    moves = [(board, direction) for board in boards for direction in ['left', 'right', 'up', 'down']]
+
+    numpy_strategy = MemoryStrategy(debug=False, memory_file=None, transposition_table_size=0)
+    bitboard_strategy = MemoryStrategy(debug=False, memory_file=None, engine='bitboard', transposition_table_size=0)
+    parser = BoardParser(calibration_dir=calibration_dir, debug=False)
+
+    for image in images:
+        board, _ = parser.parse_board(image['board_image'])
+        next_tile, _ = parser.parse_next_tile(image['next_tile_image'])
+        if not np.array_equal(board, image['board']) or int(next_tile) != image['next_tile']:
+            raise ValueError(
+                f"Fixture {image['board']} / {image['next_tile']} parsed as {board.tolist()} / {next_tile}")
+
+    cells = []
+    for image in images:
+        board_img = image['board_image']
+        scale = parser._scale_factor
+        for row in parser._tile_positions:
+            for tile_left, tile_top, tile_right, tile_bottom in row:
+                cells.append(board_img[
+                    int(tile_top * scale):int(tile_bottom * scale), int(tile_left * scale):int(tile_right * scale)
+                ])
+
+    benchmarks = {
+        'simulate_move[numpy]': (lambda item: numpy_strategy.simulate_move(*item), moves),
+        'simulate_move[bitboard]': (lambda item: bitboard_strategy.simulate_move(*item), moves),
+        'is_game_over[numpy]': (numpy_strategy.is_game_over, boards),
+        'is_game_over[bitboard]': (bitboard_strategy.is_game_over, boards),
+        'evaluate_position': (numpy_strategy.evaluate_position, boards),
+        'find_best_move[depth=1]': (lambda item: numpy_strategy.find_best_move(*item, depth=1), states),
+        'find_best_move[depth=2]': (lambda item: numpy_strategy.find_best_move(*item, depth=2), states),
+        'find_best_move[depth=3]': (lambda item: numpy_strategy.find_best_move(*item, depth=3), states),
+        'recognize_tile_value': (parser.recognize_tile_value, cells),
+        'parse_board': (lambda image: parser.parse_board(image['board_image']), images),
+        'parse_next_tile': (lambda image: parser.parse_next_tile(image['next_tile_image']), images),
+    }
+
+    results = {}
+    for name, (func, items) in benchmarks.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(func, items, min_time)
+        print(
+            f"{name:<26} {results[name]['ops_per_sec']:>12.1f} ops/sec "
+            f"{results[name]['usec_per_op']:>10.1f} us/op "
+            f"{results[name]['peak_bytes']:>10} peak bytes "
+            f"{results[name]['retained_blocks']:>6} retained blocks"
+        )
+
+    return results
+
+
+def check_thresholds(results, thresholds):
+    failures = []
+
+    for name, limits in thresholds.items():
+        if name not in results:
+            continue
+
+        result = results[name]
+        if 'min_ops_per_sec' in limits and result['ops_per_sec'] < limits['min_ops_per_sec']:
+            failures.append(f"{name}: {result['ops_per_sec']:.1f} ops/sec < {limits['min_ops_per_sec']}")
+        if 'max_peak_bytes' in limits and result['peak_bytes'] > limits['max_peak_bytes']:
+            failures.append(f"{name}: {result['peak_bytes']} peak bytes > {limits['max_peak_bytes']}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for simulation, evaluation and recognition')
+    parser.add_argument(
+        '--make-fixtures', action='store_true',
+        help='Regenerate the board corpus and fixture images from the calibration data')
+    parser.add_argument(
+        '--fixtures', default=FIXTURES_DIR,
+        help=f'Fixture directory (default: {FIXTURES_DIR})')
+    parser.add_argument(
+        '--min-time', type=float, default=0.5,
+        help='Minimum seconds to time each benchmark (default: 0.5)')
+    parser.add_argument(
+        '-k', '--only', nargs='*', default=None,
+        help='Only run benchmarks whose name contains one of these substrings')
+    parser.add_argument(
+        '-t', '--thresholds', default=None,
+        help='JSON file with per-benchmark min_ops_per_sec / max_peak_bytes; regressions fail the run')
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='Write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.fixtures)
+        return
+
+    results = run_microbenchmarks(args.fixtures, min_time=args.min_time, only=args.only)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults saved to: {args.output}')
+
+    if args.thresholds:
+        with open(args.thresholds, 'r') as f:
+            thresholds = json.load(f)
+
+        failures = check_thresholds(results, thresholds)
+        if failures:
+            print('\n=== REGRESSIONS ===')
+            for failure in failures:
+                print(failure)
+            sys.exit(1)
+
+        print('\nAll thresholds passed')
+
+
+if __name__ == '__main__':
+    main()
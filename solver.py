@@ -1,18 +1,38 @@
 import numpy as np
 import os
-import pyautogui
 import random
 import time
 
 from datetime import datetime
 from board_parser import BoardParser
+from strategies.base_strategy import MAX_SEARCH_DEPTH, spawn_cells
 from strategies.simple_strategy import SimpleStrategy
 
 
 class ThreesSolver:
-    def __init__(self, strategy=None, debug=True, log_dir='./logs', screenshots_dir='./screenshots'):
+    def __init__(self, strategy=None, debug=True, log_dir='./logs', screenshots_dir='./screenshots',
+                 move_budget_ms=None, env=None, capture_backend=None, scale_factor=None,
+                 settle=False, settle_frames=3, settle_timeout=1.0, predictive_parse=False, ponder=False):
         self._debug = debug
-        self._board_parser = BoardParser(debug=debug, calibration_dir='./')
+        self._move_budget_ms = move_budget_ms
+        self._env = env
+        self._settle = settle
+        self._settle_frames = settle_frames
+        self._settle_timeout = settle_timeout
+        self._settled_board_img = None
+        self._predictive_parse = predictive_parse
+        self._ponder = ponder
+        self._verified_board = None
+        self._prediction_hits = 0
+        self._prediction_mismatches = 0
+        self._board_parser = None
+        self._pyautogui = None
+        if env is None:
+            import pyautogui
+            self._pyautogui = pyautogui
+            self._board_parser = BoardParser(
+                debug=debug, calibration_dir='./', capture_backend=capture_backend, scale_factor=scale_factor
+            )
 
         self._strategy = strategy or SimpleStrategy(debug=self._debug)
 
@@ -46,6 +66,8 @@ class ThreesSolver:
         self.log('=== THREES SOLVER LOG ===')
         self.log(f'Started at: {datetime.now()}')
         self.log(f'Strategy: {self._strategy.__class__.__name__}')
+        if self._env is not None:
+            self.log(f'Headless mode: {self._env.__class__.__name__}')
 
     def log(self, message, console=True, level='INFO'):
         timestamp = datetime.now().strftime('%H:%M:%S')
@@ -65,11 +87,14 @@ class ThreesSolver:
             self._log_file.close()
 
     def save_final_screenshot(self):
+        if self._env is not None:
+            return False
+
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             screenshot_path = os.path.join(self._screenshots_dir, f'game_over_{timestamp}.png')
 
-            screenshot = pyautogui.screenshot()
+            screenshot = self._pyautogui.screenshot()
             screenshot.save(screenshot_path)
 
             self.log(f'Final screenshot saved: {screenshot_path}')
@@ -82,28 +107,33 @@ class ThreesSolver:
     def restart_game(self):
         self.log('Restarting game...')
 
+        if self._env is not None:
+            self._env.reset()
+            self.log('Game restarted successfully')
+            return True
+
         try:
-            pyautogui.keyDown('enter')
+            self._pyautogui.keyDown('enter')
             time.sleep(0.1)
-            pyautogui.keyUp('enter')
+            self._pyautogui.keyUp('enter')
 
             time.sleep(1)
 
-            pyautogui.keyDown('z')
+            self._pyautogui.keyDown('z')
             time.sleep(0.1)
-            pyautogui.keyUp('z')
+            self._pyautogui.keyUp('z')
 
             time.sleep(1)
 
-            pyautogui.keyDown('enter')
+            self._pyautogui.keyDown('enter')
             time.sleep(0.1)
-            pyautogui.keyUp('enter')
+            self._pyautogui.keyUp('enter')
 
             time.sleep(1)
 
-            pyautogui.keyDown('down')
+            self._pyautogui.keyDown('down')
             time.sleep(0.1)
-            pyautogui.keyUp('down')
+            self._pyautogui.keyUp('down')
 
             time.sleep(2.0)
 
@@ -121,6 +151,9 @@ class ThreesSolver:
         self._consecutive_failures = 0
         self._max_tile_reached = 0
         self._consecutive_no_change = 0
+        self._verified_board = None
+        self._prediction_hits = 0
+        self._prediction_mismatches = 0
 
     def get_game_phase(self, max_tile):
         if hasattr(self._strategy, 'get_game_phase'):
@@ -128,12 +161,58 @@ class ThreesSolver:
         return 'mid'
 
     def get_board_state(self):
-        board, _ = self._board_parser.parse_board()
+        if self._env is not None:
+            return self._env.board
+
+        board_img, self._settled_board_img = self._settled_board_img, None
+        board, _ = self._board_parser.parse_board(board_img)
         return board
 
+    def get_game_state(self):
+        if self._env is not None:
+            return self._env.board, self._env.next_tile
+
+        if self._verified_board is not None:
+            board, self._verified_board = self._verified_board, None
+            next_tile, _ = self._board_parser.parse_next_tile()
+            return board, self.validate_next_tile(next_tile)
+
+        board, next_tile, _ = self._board_parser.parse_frame()
+        return board, self.validate_next_tile(next_tile)
+
+    def get_board_after_move(self, board, direction):
+        if self._env is not None or not self._predictive_parse:
+            return self.get_board_state()
+
+        predicted_board, moved_lines = self._strategy.simulate_move_lines(board, direction)
+        board_img, self._settled_board_img = self._settled_board_img, None
+
+        new_board, matched, _ = self._board_parser.parse_board_predicted(
+            board, predicted_board, spawn_cells(direction, moved_lines), board_img)
+
+        if matched:
+            self._prediction_hits += 1
+            self._consecutive_no_change = 0
+            self._verified_board = new_board
+        else:
+            self._prediction_mismatches += 1
+            if np.array_equal(new_board, board):
+                self._consecutive_no_change += 1
+                self.log(
+                    f'Board unchanged after {direction} ({self._consecutive_no_change} in a row), '
+                    f'input may have been missed', level='WARNING'
+                )
+
+        return new_board
+
     def get_next_tile(self):
-        next_tile, parse_time = self._board_parser.parse_next_tile()
+        if self._env is not None:
+            return self._env.next_tile
 
+        next_tile, _ = self._board_parser.parse_next_tile()
+        return self.validate_next_tile(next_tile)
+
+    def validate_next_tile(self, next_tile):
         self.log(f'Raw next_tile: {next_tile} (type: {type(next_tile)})', level='DEBUG')
 
         if isinstance(next_tile, str):
@@ -156,11 +235,36 @@ class ThreesSolver:
     def make_move(self, direction):
         self.log(f'Executing: {direction}', level='DEBUG')
 
-        for _ in range(1):
-            pyautogui.keyDown(direction)
-            time.sleep(0.05)
-            pyautogui.keyUp(direction)
+        if self._env is not None:
+            _, _, _, info = self._env.step(direction)
+            if not info['moved']:
+                raise RuntimeError(f'Illegal move {direction}, the board did not change')
+            self._move_count += 1
+            return
+
+        if self._settle:
+            before_signature = self._board_parser.board_signature()
+
+            self._pyautogui.keyDown(direction)
             time.sleep(0.05)
+            self._pyautogui.keyUp(direction)
+
+            settled, board_img, settle_time = self._board_parser.wait_for_settle(
+                before_signature, self._settle_frames, self._settle_timeout)
+
+            if settled:
+                self._settled_board_img = board_img
+                self._consecutive_no_change = 0
+                self.log(f'Board settled in {settle_time * 1000:.0f} ms', level='DEBUG')
+            else:
+                self._consecutive_no_change += 1
+                self.log(f'Board did not settle within {self._settle_timeout:.2f} sec', level='WARNING')
+        else:
+            for _ in range(1):
+                self._pyautogui.keyDown(direction)
+                time.sleep(0.05)
+                self._pyautogui.keyUp(direction)
+                time.sleep(0.05)
 
         self._move_count += 1
         self._last_moves.append(direction)
@@ -168,7 +272,11 @@ class ThreesSolver:
         if len(self._last_moves) > 10:
             self._last_moves.pop(0)
 
-        time.sleep(0.1)
+        if not self._settle:
+            time.sleep(0.1)
+
+    def search_depth(self, board):
+        return 4 if np.sum(board == 0) <= 4 else 2
 
     def has_reached_target(self, board, target=384):
         reached = np.any(board >= target)
@@ -188,7 +296,8 @@ class ThreesSolver:
 
     def play_single_game(self, target_score=384):
         self.log(f'Starting new game - target: {target_score}')
-        self._board_parser.countdown_timer(3)
+        if self._env is None:
+            self._board_parser.countdown_timer(3)
 
         max_failures = 5
         aggressive_mode = False
@@ -196,8 +305,7 @@ class ThreesSolver:
         try:
             while True:
                 try:
-                    board = self.get_board_state()
-                    next_tile = self.get_next_tile()
+                    board, next_tile = self.get_game_state()
 
                     if (hasattr(self._strategy, 'start_new_game') and not hasattr(self, 'game_initialized')):
                         self._strategy.start_new_game(board)
@@ -230,15 +338,22 @@ class ThreesSolver:
                         self.log('ACTIVATING AGGRESSIVE MODE - few free cells and high tiles')
 
                     if aggressive_mode and hasattr(self._strategy, 'find_aggressive_move'):
-                        aggressive_dir = self._strategy.find_aggressive_move(board, next_tile)
-                        self.make_move(aggressive_dir)
+                        best_direction = self._strategy.find_aggressive_move(board, next_tile)
+                        self.make_move(best_direction)
                         aggressive_mode = False
+                    elif self._move_budget_ms is not None:
+                        deadline = time.perf_counter() + self._move_budget_ms / 1000
+                        _, best_direction = self._strategy.find_best_move(
+                            board, next_tile, depth=MAX_SEARCH_DEPTH, deadline=deadline)
+                        self.make_move(best_direction)
                     else:
-                        depth = 3 if free_cells <= 4 else 2
+                        depth = self.search_depth(board)
                         _, best_direction = self._strategy.find_best_move(board, next_tile, depth=depth)
+                        if self._ponder and hasattr(self._strategy, 'ponder'):
+                            self._strategy.ponder(board, best_direction, next_tile, self.search_depth)
                         self.make_move(best_direction)
 
-                    new_board = self.get_board_state()
+                    new_board = self.get_board_after_move(board, best_direction)
                     score_after = self._strategy.evaluate_position(new_board) if hasattr(self._strategy, 'evaluate_position') else 0  # noqa: E501
 
                     if hasattr(self._strategy, 'record_move'):
@@ -256,7 +371,8 @@ class ThreesSolver:
                     if self._consecutive_failures >= max_failures:
                         self.log('Too many consecutive errors, stopping')
                         break
-                    time.sleep(1)
+                    if self._env is None:
+                        time.sleep(1)
 
         finally:
             final_score = np.max(board)
@@ -270,6 +386,14 @@ class ThreesSolver:
                 if hasattr(self._strategy, 'get_memory_stats'):
                     stats = self._strategy.get_memory_stats()
                     self.log(f'Memory stats: {stats}')
+                if hasattr(self._strategy, 'get_search_stats'):
+                    self.log(f'Search stats: {self._strategy.get_search_stats()}')
+
+            if self._predictive_parse:
+                self.log(
+                    f'Predictive parse: {self._prediction_hits} verified, '
+                    f'{self._prediction_mismatches} full re-parses'
+                )
 
             if hasattr(self, 'game_initialized'):
                 del self.game_initialized
@@ -300,7 +424,8 @@ class ThreesSolver:
                 self.restart_game()
                 self.reset_game_stats()
 
-                time.sleep(1)
+                if self._env is None:
+                    time.sleep(1)
 
         except KeyboardInterrupt:
             self.log('Game interrupted by user')
@@ -313,4 +438,10 @@ class ThreesSolver:
                 self.log(f'Best score: {best_score}')
                 self.log(f'Average moves per game: {avg_moves:.1f}')
 
+            if hasattr(self._strategy, 'close'):
+                self._strategy.close()
+
+            if self._board_parser is not None:
+                self._board_parser.close()
+
             self.close_logging()
@@ -1,14 +1,37 @@
 import numpy as np
 
 from abc import ABC, abstractmethod
+from strategies import bitboard
+
+
+ENGINES = ['numpy', 'bitboard']
+MAX_SEARCH_DEPTH = 12
+
+
+def spawn_cells(direction, moved_lines):
+    lines = [line for line, moved in enumerate(moved_lines) if moved]
+
+    if direction == 'left':
+        return [(line, 3) for line in lines]
+    elif direction == 'right':
+        return [(line, 0) for line in lines]
+    elif direction == 'up':
+        return [(3, line) for line in lines]
+    elif direction == 'down':
+        return [(0, line) for line in lines]
+    return []
 
 
 class BaseStrategy(ABC):
-    def __init__(self, debug=True):
+    def __init__(self, debug=True, engine='numpy'):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown move engine: {engine}. Available engines: {ENGINES}')
+
         self._debug = debug
+        self._engine = engine
 
     @abstractmethod
-    def find_best_move(self, board, next_tile, depth=2):
+    def find_best_move(self, board, next_tile, depth=2, deadline=None):
         pass
 
     @abstractmethod
@@ -28,22 +51,29 @@ class BaseStrategy(ABC):
         return False
 
     def simulate_move(self, board, direction):
+        new_board, moved_lines = self.simulate_move_lines(board, direction)
+        return new_board, any(moved_lines)
+
+    def simulate_move_lines(self, board, direction):
+        if self._engine == 'bitboard':
+            return self._simulate_move_bitboard(board, direction)
+
         new_board = board.copy()
-        changed = False
+        moved_lines = [False] * 4
 
         if direction == 'left':
             for i in range(4):
                 original = new_board[i].copy()
                 new_board[i] = self._process_line_left(new_board[i])
                 if not np.array_equal(original, new_board[i]):
-                    changed = True
+                    moved_lines[i] = True
 
         elif direction == 'right':
             for i in range(4):
                 original = new_board[i].copy()
                 new_board[i] = self._process_line_right(new_board[i])
                 if not np.array_equal(original, new_board[i]):
-                    changed = True
+                    moved_lines[i] = True
 
         elif direction == 'up':
             for j in range(4):
@@ -51,7 +81,7 @@ class BaseStrategy(ABC):
                 new_col = self._process_line_left(original)
                 for i in range(4):
                     if new_board[i, j] != new_col[i]:
-                        changed = True
+                        moved_lines[j] = True
                     new_board[i, j] = new_col[i]
 
         elif direction == 'down':
@@ -60,10 +90,45 @@ class BaseStrategy(ABC):
                 new_col = self._process_line_right(original)
                 for i in range(4):
                     if new_board[i, j] != new_col[i]:
-                        changed = True
+                        moved_lines[j] = True
                     new_board[i, j] = new_col[i]
 
-        return new_board, changed
+        return new_board, moved_lines
+
+    def simulate_moves_batch(self, boards, direction):
+        boards = np.asarray(boards)
+        new_boards = boards.copy()
+
+        if direction == 'left':
+            lines = new_boards
+        elif direction == 'right':
+            lines = new_boards[:, :, ::-1]
+        elif direction == 'up':
+            lines = new_boards.transpose(0, 2, 1)
+        elif direction == 'down':
+            lines = new_boards.transpose(0, 2, 1)[:, :, ::-1]
+        else:
+            return new_boards, np.zeros(len(boards), dtype=bool)
+
+        for j in range(1, 4):
+            prev = lines[:, :, j-1]
+            cur = lines[:, :, j]
+
+            one_two = ((prev == 1) & (cur == 2)) | ((prev == 2) & (cur == 1))
+            pair = (cur >= 3) & (prev == cur)
+            moved = (cur != 0) & ((prev == 0) | one_two | pair)
+
+            prev[moved] += cur[moved]
+            cur[moved] = 0
+
+        changed = np.any(new_boards != boards, axis=(1, 2))
+
+        return new_boards, changed
+
+    def _simulate_move_bitboard(self, board, direction):
+        packed = bitboard.pack_board(board)
+        moved = bitboard.move(packed, direction)
+        return bitboard.unpack_board(moved), bitboard.moved_lines(packed, moved, direction)
 
     def _process_line_left(self, line):
         line = line.copy()
@@ -94,6 +159,9 @@ class BaseStrategy(ABC):
         return line
 
     def is_game_over(self, board):
+        if self._engine == 'bitboard':
+            return bitboard.is_game_over(bitboard.pack_board(board))
+
         if np.any(board == 0):
             return False
 
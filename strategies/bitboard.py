@@ -0,0 +1,205 @@
+import numpy as np
+
+
+DIRECTIONS = ['left', 'right', 'up', 'down']
+
+MAX_RANK = 15
+MAX_TILE = 3 << (MAX_RANK - 3)
+
+_ROW_MASK = 0xFFFF
+_INVALID_RANK = 0xFF
+
+_CELL_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+
+def tile_to_rank(value):
+    if value <= 0:
+        return 0
+    if value < 3:
+        return int(value)
+    return (int(value) // 3).bit_length() + 2
+
+
+def rank_to_tile(rank):
+    if rank < 3:
+        return rank
+    return 3 << (rank - 3)
+
+
+def _build_rank_lookup():
+    lookup = np.full(MAX_TILE + 1, _INVALID_RANK, dtype=np.uint64)
+    for rank in range(MAX_RANK + 1):
+        lookup[rank_to_tile(rank)] = rank
+    return lookup
+
+
+_RANK_OF_TILE = _build_rank_lookup()
+_TILE_OF_RANK = np.array([rank_to_tile(rank) for rank in range(MAX_RANK + 1)], dtype=int)
+
+
+def pack_board(board):
+    values = np.asarray(board).ravel()
+    if values.max() > MAX_TILE or values.min() < 0:
+        raise ValueError(f'Board contains tiles outside the bitboard range: {values.tolist()}')
+
+    ranks = _RANK_OF_TILE[values]
+    if ranks.max() == _INVALID_RANK:
+        raise ValueError(f'Board contains tiles that are not valid Threes values: {values.tolist()}')
+
+    return int(np.bitwise_or.reduce(ranks << _CELL_SHIFTS))
+
+
+def unpack_board(packed):
+    ranks = (np.uint64(packed) >> _CELL_SHIFTS) & np.uint64(0xF)
+    return _TILE_OF_RANK[ranks.astype(np.intp)].reshape(4, 4)
+
+
+def _shift_rank_lines_left(lines):
+    lines = lines.copy()
+
+    for j in range(1, 4):
+        prev = lines[:, j-1]
+        cur = lines[:, j]
+
+        slide = (cur != 0) & (prev == 0)
+        one_two = ((prev == 1) & (cur == 2)) | ((prev == 2) & (cur == 1))
+        pair = (cur >= 3) & (prev == cur) & (cur < MAX_RANK)
+
+        prev[slide] = cur[slide]
+        prev[one_two] = 3
+        prev[pair] += 1
+        cur[slide | one_two | pair] = 0
+
+    return lines
+
+
+def _build_row_tables():
+    rows = np.arange(1 << 16, dtype=np.int64)
+    lines = np.stack([(rows >> (4 * j)) & 0xF for j in range(4)], axis=1)
+
+    shifted = _shift_rank_lines_left(lines)
+    left = np.bitwise_or.reduce(shifted << (4 * np.arange(4)), axis=1)
+
+    reversed_rows = np.bitwise_or.reduce(lines[:, ::-1] << (4 * np.arange(4)), axis=1)
+    right = np.empty_like(left)
+    right[reversed_rows] = np.bitwise_or.reduce(shifted[:, ::-1] << (4 * np.arange(4)), axis=1)
+
+    return left.tolist(), right.tolist(), reversed_rows.tolist()
+
+
+_ROW_LEFT, _ROW_RIGHT, _ROW_REVERSE = _build_row_tables()
+
+
+def transpose(board):
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def mirror(board):
+    return _move_rows(board, _ROW_REVERSE)
+
+
+def flip(board):
+    return (
+        (board >> 48)
+        | ((board >> 16) & 0xFFFF0000)
+        | ((board << 16) & 0xFFFF00000000)
+        | ((board & _ROW_MASK) << 48)
+    )
+
+
+def _build_symmetry_directions():
+    swaps = {
+        'transpose': {'left': 'up', 'up': 'left', 'right': 'down', 'down': 'right'},
+        'mirror': {'left': 'right', 'right': 'left'},
+        'flip': {'up': 'down', 'down': 'up'}
+    }
+
+    symmetries = []
+    for transposed in (False, True):
+        for flipped in (False, True):
+            for mirrored in (False, True):
+                mapping = {}
+                for direction in DIRECTIONS:
+                    mapped = direction
+                    if transposed:
+                        mapped = swaps['transpose'][mapped]
+                    if mirrored:
+                        mapped = swaps['mirror'].get(mapped, mapped)
+                    if flipped:
+                        mapped = swaps['flip'].get(mapped, mapped)
+                    mapping[direction] = mapped
+                symmetries.append(mapping)
+
+    return symmetries
+
+
+SYMMETRY_DIRECTIONS = _build_symmetry_directions()
+SYMMETRY_INVERSE_DIRECTIONS = [
+    {mapped: direction for direction, mapped in mapping.items()} for mapping in SYMMETRY_DIRECTIONS
+]
+
+
+def symmetries(board):
+    variants = []
+    for base in (board, transpose(board)):
+        mirrored = mirror(base)
+        variants.extend((base, mirrored, flip(base), flip(mirrored)))
+    return variants
+
+
+def canonicalize(board):
+    variants = symmetries(board)
+    canonical = min(variants)
+    return canonical, variants.index(canonical)
+
+
+def _move_rows(board, table):
+    return (
+        table[board & _ROW_MASK]
+        | table[(board >> 16) & _ROW_MASK] << 16
+        | table[(board >> 32) & _ROW_MASK] << 32
+        | table[board >> 48] << 48
+    )
+
+
+def move(board, direction):
+    if direction == 'left':
+        return _move_rows(board, _ROW_LEFT)
+    elif direction == 'right':
+        return _move_rows(board, _ROW_RIGHT)
+    elif direction == 'up':
+        return transpose(_move_rows(transpose(board), _ROW_LEFT))
+    elif direction == 'down':
+        return transpose(_move_rows(transpose(board), _ROW_RIGHT))
+    return board
+
+
+def moved_lines(board, new_board, direction):
+    if direction in ('up', 'down'):
+        board = transpose(board)
+        new_board = transpose(new_board)
+
+    return [((board >> shift) & _ROW_MASK) != ((new_board >> shift) & _ROW_MASK) for shift in (0, 16, 32, 48)]
+
+
+def count_empty(board):
+    return sum(1 for shift in range(0, 64, 4) if ((board >> shift) & 0xF) == 0)
+
+
+def is_game_over(board):
+    if count_empty(board) > 0:
+        return False
+
+    for direction in DIRECTIONS:
+        if move(board, direction) != board:
+            return False
+
+    return True
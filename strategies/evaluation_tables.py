@@ -0,0 +1,195 @@
+import numpy as np
+
+from strategies import bitboard
+
+
+FIELD_BITS = 8
+LARGE_SHIFT = 24
+SUMS_MASK = (1 << 48) - 1
+MASKS_SHIFT = 48
+
+MONOTONICITY_BIAS = 3
+LARGE_TILE_THRESHOLD = 12
+
+_CORNER_DISTANCE = [min(j, 3 - j) for j in range(4)]
+
+
+def _line_arrays():
+    lines = np.arange(1 << 16, dtype=np.int64)
+    ranks = np.stack([(lines >> (4 * j)) & 0xF for j in range(4)], axis=1)
+    values = np.array([bitboard.rank_to_tile(rank) for rank in range(16)], dtype=np.int64)[ranks]
+    return ranks, values
+
+
+def _can_merge(a, b):
+    one_two = ((a == 1) & (b == 2)) | ((a == 2) & (b == 1))
+    return (a != 0) & (b != 0) & (one_two | ((a >= 3) & (a == b)))
+
+
+def _is_one_two_pair(a, b):
+    return ((a == 1) & (b == 2)) | ((a == 2) & (b == 1))
+
+
+def _bits(flags):
+    return np.bitwise_or.reduce(flags.astype(np.int64) << np.arange(flags.shape[1]), axis=1)
+
+
+def _scatter_column_mask(mask):
+    return sum(((mask >> i) & 1) << (4 * i) for i in range(4))
+
+
+def _combine(sums, masks):
+    return [total | (extra << MASKS_SHIFT) for total, extra in zip(sums.tolist(), masks.tolist())]
+
+
+def _build_memory_tables():
+    ranks, values = _line_arrays()
+
+    free = (values == 0).sum(axis=1)
+    monotonicity = np.zeros(len(values), dtype=np.int64)
+    merges = np.zeros(len(values), dtype=np.int64)
+    large = np.zeros(len(values), dtype=np.int64)
+    partner = np.zeros(values.shape, dtype=bool)
+
+    for j in range(3):
+        a, b = values[:, j], values[:, j+1]
+
+        descending = (a >= b) & (a > 0)
+        monotonicity += descending
+        monotonicity -= ~descending & (a > 0) & (b > 0)
+
+        merges += 2 * _can_merge(a, b)
+
+        both_large = (a >= LARGE_TILE_THRESHOLD) & (b >= LARGE_TILE_THRESHOLD)
+        large += np.where(both_large, np.minimum(a, b) // 3, 0)
+
+        one_two = _is_one_two_pair(a, b)
+        partner[:, j] |= one_two
+        partner[:, j+1] |= one_two
+
+    sums = (
+        free
+        | (monotonicity + MONOTONICITY_BIAS) << FIELD_BITS
+        | merges << (2 * FIELD_BITS)
+        | large << LARGE_SHIFT
+    )
+
+    ones_twos = _bits((values == 1) | (values == 2))
+    partners = _bits(partner)
+
+    max_rank = ranks.max(axis=1)
+    at_max = ranks == max_rank[:, np.newaxis]
+    max_count = at_max.sum(axis=1)
+    max_distance = (at_max * np.array(_CORNER_DISTANCE)).sum(axis=1)
+
+    row_masks = ones_twos | partners << 4 | max_rank << 8 | max_count << 12 | max_distance << 16
+    column_masks = _scatter_column_mask(partners)
+
+    return _combine(sums, row_masks), _combine(sums, column_masks)
+
+
+def _build_simple_tables():
+    ranks, values = _line_arrays()
+
+    free = (values == 0).sum(axis=1)
+    monotonicity = np.zeros(len(values), dtype=np.int64)
+    partner = np.zeros(values.shape, dtype=bool)
+
+    for j in range(3):
+        a, b = values[:, j], values[:, j+1]
+        monotonicity += (a >= b) & (a > 0)
+        partner[:, j] = ((a == 1) | (a == 2)) & _can_merge(a, b)
+
+    sums = free | monotonicity << FIELD_BITS
+
+    ones_twos = _bits((values == 1) | (values == 2))
+    partners = _bits(partner)
+    max_rank = ranks.max(axis=1)
+
+    row_masks = ones_twos | partners << 4 | max_rank << 8
+    column_masks = _scatter_column_mask(partners)
+
+    return _combine(sums, row_masks), _combine(sums, column_masks)
+
+
+MEMORY_ROW_TABLE, MEMORY_COLUMN_TABLE = _build_memory_tables()
+SIMPLE_ROW_TABLE, SIMPLE_COLUMN_TABLE = _build_simple_tables()
+
+
+def _lines(packed):
+    columns = bitboard.transpose(packed)
+    rows = [(packed >> shift) & 0xFFFF for shift in (0, 16, 32, 48)]
+    columns = [(columns >> shift) & 0xFFFF for shift in (0, 16, 32, 48)]
+    return rows, columns
+
+
+def memory_features(packed):
+    rows, columns = _lines(packed)
+    row_entries = [MEMORY_ROW_TABLE[row] for row in rows]
+    column_entries = [MEMORY_COLUMN_TABLE[column] for column in columns]
+
+    row_sums = sum(row_entries) & SUMS_MASK
+    column_sums = sum(column_entries) & SUMS_MASK
+
+    ones_twos = 0
+    partners = 0
+    max_rank = 0
+    for i, entry in enumerate(row_entries):
+        masks = entry >> MASKS_SHIFT
+        ones_twos |= (masks & 0xF) << (4 * i)
+        partners |= ((masks >> 4) & 0xF) << (4 * i)
+        max_rank = max(max_rank, (masks >> 8) & 0xF)
+
+    for j, entry in enumerate(column_entries):
+        partners |= (entry >> MASKS_SHIFT) << j
+
+    corner_bonus = 0
+    for i, entry in enumerate(row_entries):
+        masks = entry >> MASKS_SHIFT
+        if ((masks >> 8) & 0xF) == max_rank:
+            count = (masks >> 12) & 0xF
+            distance = (masks >> 16) & 0xF
+            corner_bonus += (count * (6 - _CORNER_DISTANCE[i]) - distance) * 5
+
+    field = (1 << FIELD_BITS) - 1
+
+    return {
+        'max_tile': bitboard.rank_to_tile(max_rank),
+        'free_cells': row_sums & field,
+        'corner_bonus': corner_bonus,
+        'monotonicity': (
+            ((row_sums >> FIELD_BITS) & field) + ((column_sums >> FIELD_BITS) & field) - 8 * MONOTONICITY_BIAS
+        ),
+        'merge_potential': ((row_sums >> (2 * FIELD_BITS)) & field) + ((column_sums >> (2 * FIELD_BITS)) & field),
+        'penalty_12': 5 * bin(ones_twos & ~partners).count('1'),
+        'large_tiles_bonus': (row_sums >> LARGE_SHIFT) + (column_sums >> LARGE_SHIFT),
+    }
+
+
+def simple_features(packed):
+    rows, columns = _lines(packed)
+    row_entries = [SIMPLE_ROW_TABLE[row] for row in rows]
+    column_entries = [SIMPLE_COLUMN_TABLE[column] for column in columns]
+
+    row_sums = sum(row_entries) & SUMS_MASK
+
+    ones_twos = 0
+    partners = 0
+    max_rank = 0
+    for i, entry in enumerate(row_entries):
+        masks = entry >> MASKS_SHIFT
+        ones_twos |= (masks & 0xF) << (4 * i)
+        partners |= ((masks >> 4) & 0xF) << (4 * i)
+        max_rank = max(max_rank, (masks >> 8) & 0xF)
+
+    for j, entry in enumerate(column_entries):
+        partners |= (entry >> MASKS_SHIFT) << j
+
+    field = (1 << FIELD_BITS) - 1
+
+    return {
+        'free_cells': row_sums & field,
+        'max_in_corner': (packed & 0xF) == max_rank,
+        'monotonicity': (row_sums >> FIELD_BITS) & field,
+        'isolated_12': bin(ones_twos & ~partners).count('1'),
+    }
@@ -0,0 +1,635 @@
+import glob
+import heapq
+import itertools
+import json
+import numpy as np
+import os
+import re
+import sqlite3
+import sys
+
+from array import array
+
+from strategies import bitboard
+
+
+DIRECTIONS = bitboard.DIRECTIONS
+
+COUNT, SUCCESS, MEAN, MAX = range(4)
+MOVE_FIELDS = 4
+
+_DIRECTION_OFFSETS = {direction: k * MOVE_FIELDS for k, direction in enumerate(DIRECTIONS)}
+_EMPTY_STATS = bytes(8 * MOVE_FIELDS * len(DIRECTIONS))
+
+
+class MemoryState:
+    __slots__ = ('visits', 'best_score', 'last_used', 'stats')
+
+    def __init__(self, visits=0, best_score=0, moves=None):
+        self.visits = visits
+        self.best_score = best_score
+        self.last_used = 0
+        self.stats = array('d', _EMPTY_STATS)
+
+        if moves:
+            for direction, move in moves.items():
+                self.set_move(direction, move)
+
+    def get_move(self, direction):
+        offset = _DIRECTION_OFFSETS[direction]
+        count = int(self.stats[offset + COUNT])
+        if count == 0:
+            return None
+        return [count, int(self.stats[offset + SUCCESS]), self.stats[offset + MEAN], int(self.stats[offset + MAX])]
+
+    def set_move(self, direction, move):
+        offset = _DIRECTION_OFFSETS[direction]
+        self.stats[offset:offset + MOVE_FIELDS] = array('d', move)
+
+    @property
+    def moves(self):
+        moves = {}
+        for direction in DIRECTIONS:
+            move = self.get_move(direction)
+            if move is not None:
+                moves[direction] = move
+        return moves
+
+    def frequency(self):
+        return self.visits + sum(self.stats[COUNT::MOVE_FIELDS])
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.stats)
+
+
+def merge_states(state, other):
+    state.visits += other.visits
+    state.best_score = max(state.best_score, other.best_score)
+
+    for direction, move in other.moves.items():
+        current = state.get_move(direction)
+        if current is None:
+            state.set_move(direction, move)
+            continue
+
+        count = current[COUNT] + move[COUNT]
+        current[MEAN] = (current[MEAN] * current[COUNT] + move[MEAN] * move[COUNT]) / count
+        current[COUNT] = count
+        current[SUCCESS] += move[SUCCESS]
+        current[MAX] = max(current[MAX], move[MAX])
+        state.set_move(direction, current)
+
+    return state
+
+
+def subtract_states(state, base):
+    delta = MemoryState(state.visits - base.visits, state.best_score)
+
+    for direction, move in state.moves.items():
+        base_move = base.get_move(direction)
+        if base_move is None:
+            delta.set_move(direction, move)
+            continue
+
+        count = move[COUNT] - base_move[COUNT]
+        if count > 0:
+            mean = (move[MEAN] * move[COUNT] - base_move[MEAN] * base_move[COUNT]) / count
+            delta.set_move(direction, [count, move[SUCCESS] - base_move[SUCCESS], mean, move[MAX]])
+
+    return delta
+
+
+def to_signed(packed):
+    return packed - (1 << 64) if packed >= 1 << 63 else packed
+
+
+class MemoryStore:
+    EVICT_FRACTION = 0.125
+
+    def __init__(self, max_states=None):
+        self._cache = {}
+        self._dirty = set()
+        self._created = set()
+        self._max_states = max_states
+        self._clock = 0
+        self._evicted = 0
+
+    def _load_state(self, key):
+        return None
+
+    def _write_states(self, states):
+        pass
+
+    def get(self, key):
+        state = self._cache.get(key)
+        if state is None:
+            state = self._load_state(key)
+            if state is not None:
+                self._insert(key, state)
+
+        if state is not None:
+            self._clock += 1
+            state.last_used = self._clock
+        return state
+
+    def _insert(self, key, state):
+        if self._max_states and len(self._cache) >= self._max_states:
+            self._evict(max(1, int(self._max_states * self.EVICT_FRACTION)))
+        self._cache[key] = state
+
+    def _evict(self, count):
+        victims = sorted(
+            self._cache, key=lambda key: (self._cache[key].frequency(), self._cache[key].last_used)
+        )[:count]
+
+        dirty = [(key, self._cache[key]) for key in victims if key in self._dirty]
+        if dirty:
+            self._write_states(dirty)
+
+        for key in victims:
+            del self._cache[key]
+            self._dirty.discard(key)
+
+        self._evicted += len(victims)
+
+    def visit(self, key):
+        state = self.get(key)
+        if state is not None:
+            state.visits += 1
+            self._dirty.add(key)
+        return state
+
+    def record(self, key, direction, score_change, result_score, failed=False):
+        score_change = float(score_change)
+        result_score = int(result_score)
+
+        state = self.get(key)
+        if state is None:
+            state = MemoryState(best_score=0 if failed else result_score)
+            self._insert(key, state)
+            state.last_used = self._clock
+            self._created.add(key)
+
+        move = state.get_move(direction)
+        if move is None:
+            move = [0, 0, 0.0, 0 if failed else result_score]
+
+        move[COUNT] += 1
+        move[MEAN] += (score_change - move[MEAN]) / move[COUNT]
+
+        if not failed:
+            if result_score > state.best_score:
+                state.best_score = result_score
+
+            if result_score > move[MAX]:
+                move[MAX] = result_score
+                move[SUCCESS] += 1
+
+        state.set_move(direction, move)
+        self._dirty.add(key)
+
+    def _mark_written(self, states):
+        self._created.difference_update(key for key, _ in states)
+
+    def flush(self):
+        if self._dirty:
+            self._write_states([(key, self._cache[key]) for key in self._dirty])
+            self._dirty = set()
+
+    def close(self):
+        pass
+
+    def memory_bytes(self):
+        key_bytes = sum(sys.getsizeof(key) + sys.getsizeof(key[0]) for key in self._cache)
+        state_bytes = sum(state.nbytes() for state in self._cache.values())
+        return sys.getsizeof(self._cache) + sys.getsizeof(self._dirty) + key_bytes + state_bytes
+
+    def get_stats(self):
+        return {
+            'states': len(self),
+            'cached_states': len(self._cache),
+            'max_states': self._max_states,
+            'evicted': self._evicted,
+            'bytes_used': self.memory_bytes()
+        }
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class JsonMemoryStore(MemoryStore):
+    def __init__(self, path=None, max_states=None):
+        super().__init__(None if path else max_states)
+        self._path = path
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self._cache = self._parse(json.load(f))
+
+    def items(self):
+        return self._cache.items()
+
+    @staticmethod
+    def _parse(data):
+        states = {}
+
+        for key, entry in data.items():
+            if 'visit_count' in entry:
+                board_part, next_tile = key.rsplit('_', 1)
+                board_part = re.sub(r'np\.int\d+\((\d+)\)', r'\1', board_part)
+                board = [int(value) for value in board_part.strip('()').split(',')]
+                packed, symmetry = bitboard.canonicalize(bitboard.pack_board(np.array(board).reshape(4, 4)))
+                directions = bitboard.SYMMETRY_DIRECTIONS[symmetry]
+
+                moves = {}
+                for direction, move_data in entry['moves'].items():
+                    changes = move_data['score_changes']
+                    moves[directions[direction]] = [
+                        move_data['total_count'],
+                        move_data['success_count'],
+                        sum(changes) / len(changes) if changes else 0.0,
+                        move_data['max_score_achieved']
+                    ]
+
+                state = MemoryState(entry['visit_count'], entry['best_score'], moves)
+                key = (packed, int(next_tile))
+                if key in states:
+                    merge_states(states[key], state)
+                else:
+                    states[key] = state
+            else:
+                packed, next_tile = key.split('_')
+                states[(int(packed), int(next_tile))] = MemoryState(
+                    entry['visits'], entry['best_score'], entry['moves'])
+
+        return states
+
+    def flush(self):
+        self._dirty = set()
+        self._created = set()
+
+        if not self._path:
+            return
+
+        data = {
+            f'{packed}_{next_tile}': {
+                'visits': state.visits,
+                'best_score': state.best_score,
+                'moves': state.moves
+            }
+            for (packed, next_tile), state in self._cache.items()
+        }
+
+        with open(self._path, 'w') as f:
+            json.dump(data, f)
+
+
+class SQLiteMemoryStore(MemoryStore):
+    def __init__(self, path, max_states=None):
+        super().__init__(max_states)
+        self._path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS states (
+                board INTEGER NOT NULL,
+                next_tile INTEGER NOT NULL,
+                visits INTEGER NOT NULL,
+                best_score INTEGER NOT NULL,
+                PRIMARY KEY (board, next_tile)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS moves (
+                board INTEGER NOT NULL,
+                next_tile INTEGER NOT NULL,
+                direction INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                success INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                max INTEGER NOT NULL,
+                PRIMARY KEY (board, next_tile, direction)
+            ) WITHOUT ROWID;
+        ''')
+        self._stored_states = self._connection.execute('SELECT COUNT(*) FROM states').fetchone()[0]
+
+    def _load_state(self, key):
+        packed, next_tile = key
+        rows = self._connection.execute(
+            'SELECT s.visits, s.best_score, m.direction, m.count, m.success, m.mean, m.max '
+            'FROM states s LEFT JOIN moves m ON m.board = s.board AND m.next_tile = s.next_tile '
+            'WHERE s.board = ? AND s.next_tile = ?',
+            (to_signed(packed), next_tile)
+        ).fetchall()
+
+        if not rows:
+            return None
+
+        moves = {
+            DIRECTIONS[direction]: [count, success, mean, max_score]
+            for _, _, direction, count, success, mean, max_score in rows if direction is not None
+        }
+        return MemoryState(rows[0][0], rows[0][1], moves)
+
+    def _write_states(self, states):
+        state_rows = []
+        move_rows = []
+
+        for (packed, next_tile), state in states:
+            board = to_signed(packed)
+            state_rows.append((board, next_tile, state.visits, state.best_score))
+            for direction, move in state.moves.items():
+                move_rows.append((board, next_tile, DIRECTIONS.index(direction), *move))
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO states VALUES (?, ?, ?, ?) ON CONFLICT (board, next_tile) DO UPDATE SET '
+                'visits = excluded.visits, best_score = excluded.best_score',
+                state_rows
+            )
+            self._connection.executemany(
+                'INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (board, next_tile, direction) '
+                'DO UPDATE SET count = excluded.count, success = excluded.success, '
+                'mean = excluded.mean, max = excluded.max',
+                move_rows
+            )
+
+        self._stored_states = self._connection.execute('SELECT COUNT(*) FROM states').fetchone()[0]
+        self._mark_written(states)
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self):
+        return self._stored_states + len(self._created)
+
+
+RECORD_DTYPE = np.dtype([
+    ('board', '<u8'),
+    ('next_tile', '<u4'),
+    ('visits', '<u4'),
+    ('best_score', '<u4'),
+    ('reserved', '<u4'),
+    ('stats', '<f8', (MOVE_FIELDS * len(DIRECTIONS),))
+])
+
+
+def states_to_records(states):
+    records = np.zeros(len(states), dtype=RECORD_DTYPE)
+
+    for k, ((packed, next_tile), state) in enumerate(states):
+        records[k]['board'] = packed
+        records[k]['next_tile'] = next_tile
+        records[k]['visits'] = state.visits
+        records[k]['best_score'] = state.best_score
+        records[k]['stats'] = np.frombuffer(state.stats, dtype=np.float64)
+
+    return records[np.lexsort((records['next_tile'], records['board']))]
+
+
+def record_to_state(record):
+    state = MemoryState(int(record['visits']), int(record['best_score']))
+    state.stats = array('d', record['stats'].tobytes())
+    return state
+
+
+def load_records(path):
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    records = np.load(path, mmap_mode='r')
+    if records.dtype != RECORD_DTYPE:
+        raise ValueError(f'{path} is not a memory file: unexpected record type {records.dtype}')
+    return records
+
+
+def find_record(records, packed, next_tile):
+    boards = records['board']
+    start = np.searchsorted(boards, np.uint64(packed), side='left')
+
+    for index in range(start, len(boards)):
+        if boards[index] != packed:
+            break
+        if records[index]['next_tile'] == next_tile:
+            return index
+    return None
+
+
+def contains_records(records, keys):
+    boards = records['board']
+    start = np.searchsorted(boards, keys['board'], side='left')
+    end = np.searchsorted(boards, keys['board'], side='right')
+
+    found = np.zeros(len(keys), dtype=bool)
+    for offset in range(int(np.max(end - start, initial=0))):
+        index = start + offset
+        candidates = index < end
+        found[candidates] |= records['next_tile'][index[candidates]] == keys['next_tile'][candidates]
+    return found
+
+
+def replace_records(records, updates):
+    combined = np.concatenate([updates, records])
+    combined = combined[np.lexsort((combined['next_tile'], combined['board']))]
+
+    keep = np.ones(len(combined), dtype=bool)
+    keep[1:] = (combined['board'][1:] != combined['board'][:-1]) | \
+               (combined['next_tile'][1:] != combined['next_tile'][:-1])
+    return combined[keep]
+
+
+def save_records(path, records):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, records)
+    os.replace(temp_path, path)
+
+
+def delta_path(path):
+    root, extension = os.path.splitext(path)
+    return f'{root}.delta{extension}'
+
+
+class MmapMemoryStore(MemoryStore):
+    COMPACT_FRACTION = 0.1
+    COMPACT_MIN_RECORDS = 1 << 14
+
+    def __init__(self, path, max_states=None):
+        super().__init__(max_states)
+        self._path = path
+        self._delta_path = delta_path(path)
+        self._records = load_records(path)
+        self._delta = load_records(self._delta_path)
+        self._delta_only = int(np.count_nonzero(~contains_records(self._records, self._delta)))
+
+    def _load_state(self, key):
+        index = find_record(self._delta, *key)
+        if index is not None:
+            return record_to_state(self._delta[index])
+
+        index = find_record(self._records, *key)
+        if index is not None:
+            return record_to_state(self._records[index])
+        return None
+
+    def _write_states(self, states):
+        self._delta_only += sum(1 for key, _ in states if key in self._created)
+
+        delta = replace_records(self._delta, states_to_records(states))
+        self._delta = None
+        save_records(self._delta_path, delta)
+        self._delta = load_records(self._delta_path)
+        self._mark_written(states)
+
+        if len(self._delta) > max(self.COMPACT_MIN_RECORDS, self.COMPACT_FRACTION * len(self._records)):
+            self.compact()
+
+    def compact(self):
+        if len(self._delta) == 0:
+            return
+
+        self._records = None
+        self._delta = None
+        merge_memory_files([self._path, self._delta_path], self._path, replace=True)
+        os.remove(self._delta_path)
+
+        self._records = load_records(self._path)
+        self._delta = load_records(self._delta_path)
+        self._delta_only = 0
+
+    def __len__(self):
+        return len(self._records) + self._delta_only + len(self._created)
+
+
+def compact_memory_file(path):
+    MmapMemoryStore(path).compact()
+
+
+class ShardMemoryStore(MemoryStore):
+    def __init__(self, path, shard_path, max_states=None):
+        super().__init__(max_states)
+        self._base = MmapMemoryStore(path)
+        self._shard_path = shard_path
+        self._shard = load_records(shard_path)
+        in_base = contains_records(self._base._records, self._shard) | contains_records(self._base._delta, self._shard)
+        self._shard_only = int(np.count_nonzero(~in_base))
+
+    def _base_state(self, key):
+        return self._base._load_state(key)
+
+    def _load_state(self, key):
+        state = self._base_state(key)
+
+        index = find_record(self._shard, *key)
+        if index is not None:
+            delta = record_to_state(self._shard[index])
+            state = merge_states(state, delta) if state is not None else delta
+
+        return state
+
+    def _write_states(self, states):
+        deltas = []
+        for key, state in states:
+            base = self._base_state(key)
+            deltas.append((key, subtract_states(state, base) if base is not None else state))
+
+        self._shard_only += sum(1 for key, _ in states if key in self._created)
+
+        shard = replace_records(self._shard, states_to_records(deltas))
+        self._shard = None
+        save_records(self._shard_path, shard)
+        self._shard = load_records(self._shard_path)
+        self._mark_written(states)
+
+    def __len__(self):
+        return len(self._base) + self._shard_only + len(self._created)
+
+
+def shard_path(path, worker_id):
+    root, extension = os.path.splitext(path)
+    return f'{root}.shard-{worker_id}{extension}'
+
+
+def find_shards(path):
+    root, extension = os.path.splitext(path)
+    return sorted(glob.glob(f'{glob.escape(root)}.shard-*{extension}'))
+
+
+def _iter_records(path, chunk_size):
+    records = load_records(path)
+    for start in range(0, len(records), chunk_size):
+        for record in np.array(records[start:start + chunk_size]):
+            yield (int(record['board']), int(record['next_tile'])), record
+
+
+def _merged_records(paths, chunk_size, replace=False):
+    streams = [_iter_records(path, chunk_size) for path in paths]
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+
+    for key, group in itertools.groupby(merged, key=lambda item: item[0]):
+        records = [record for _, record in group]
+        if len(records) == 1 or replace:
+            yield records[-1]
+            continue
+
+        state = record_to_state(records[0])
+        for record in records[1:]:
+            merge_states(state, record_to_state(record))
+        yield states_to_records([(key, state)])[0]
+
+
+def merge_memory_files(paths, output_path, chunk_size=1 << 16, replace=False):
+    count = sum(1 for _ in _merged_records(paths, chunk_size, replace))
+
+    temp_path = output_path + '.tmp'
+    output = np.lib.format.open_memmap(temp_path, mode='w+', dtype=RECORD_DTYPE, shape=(count,))
+
+    buffer = []
+    position = 0
+    for record in _merged_records(paths, chunk_size, replace):
+        buffer.append(record)
+        if len(buffer) == chunk_size:
+            output[position:position + len(buffer)] = buffer
+            position += len(buffer)
+            buffer = []
+
+    if buffer:
+        output[position:position + len(buffer)] = buffer
+
+    output.flush()
+    del output
+    os.replace(temp_path, output_path)
+
+    return count
+
+
+def merge_memory_shards(paths, output_path, chunk_size=1 << 16):
+    for path in paths:
+        if os.path.exists(delta_path(path)):
+            compact_memory_file(path)
+    return merge_memory_files(paths, output_path, chunk_size)
+
+
+def open_memory_store(path, max_states=None, shard=None):
+    if shard is not None:
+        if not path or not path.endswith('.npy'):
+            raise ValueError(f'Memory shards need a .npy memory file, got: {path}')
+        return ShardMemoryStore(path, shard, max_states)
+    if not path or path.endswith('.json'):
+        return JsonMemoryStore(path, max_states)
+    if path.endswith('.npy'):
+        store = MmapMemoryStore(path, max_states)
+    else:
+        store = SQLiteMemoryStore(path, max_states)
+
+    legacy_path = os.path.splitext(path)[0] + '.json'
+    if len(store) == 0 and os.path.exists(legacy_path):
+        import_memory(store, JsonMemoryStore(legacy_path))
+
+    return store
+
+
+def import_memory(store, source):
+    states = list(source.items())
+    if states:
+        store._write_states(states)
+    return len(states)
@@ -3,51 +3,117 @@ import numpy as np
 import os
 import random
 
-from strategies.base_strategy import BaseStrategy
+from strategies import bitboard, evaluation_tables
+from strategies.memory_store import COUNT, MAX, MEAN, SUCCESS, open_memory_store
+from strategies.search_strategy import SearchStrategy
 
 
-class MemoryStrategy(BaseStrategy):
-    def __init__(self, debug=True, memory_file='./memory/game_memory.json'):
-        super().__init__(debug)
+MEMORY_WEIGHTS_FILE = './memory_weights.json'
+
+GAME_PHASES = ['early', 'mid', 'late']
+PHASE_FEATURES = ['free_cells', 'max_corner', 'monotonicity', 'merges', 'penalty_12']
+
+
+class MemoryStrategy(SearchStrategy):
+    def __init__(self, debug=True, memory_file='./memory/game_memory.sqlite', engine='numpy',
+                 transposition_table_size=1 << 18, search_workers=0, memory_max_states=1 << 18,
+                 memory_shard=None, weights_file=None, weights=None):
+        super().__init__(debug, engine, transposition_table_size, search_workers)
 
         self._move_history = []
 
         self._memory_file = memory_file
+        self._memory_max_states = memory_max_states
+        self._memory_shard = memory_shard
+        if memory_file and os.path.dirname(memory_file):
+            os.makedirs(os.path.dirname(memory_file), exist_ok=True)
         self._memory = self.load_memory()
 
         self._game_states_seen = 0
         self._memory_hits = 0
+        self._transformed_hits = 0
 
         self._game_phase_weights = {
             'early': {'free_cells': 2.0, 'max_corner': 3.0, 'monotonicity': 1.0, 'merges': 1.5, 'penalty_12': 1.0},
             'mid': {'free_cells': 1.5, 'max_corner': 2.5, 'monotonicity': 1.5, 'merges': 2.0, 'penalty_12': 1.2},
             'late': {'free_cells': 1.0, 'max_corner': 3.0, 'monotonicity': 2.0, 'merges': 2.5, 'penalty_12': 1.5}
         }
+        self._phase_cutoffs = [24, 192]
+
+        self._weights_file = weights_file
+        if weights_file and os.path.exists(weights_file):
+            self.load_weights()
+        if weights is not None:
+            self.set_phase_weights(weights['phase_weights'], weights['phase_cutoffs'])
 
-        os.makedirs(os.path.dirname(memory_file), exist_ok=True)
+        self.start_search_workers()
+
+    def worker_kwargs(self):
+        kwargs = super().worker_kwargs()
+        kwargs['memory_file'] = None
+        kwargs['weights'] = self.get_phase_weights()
+        return kwargs
+
+    def load_weights(self):
+        try:
+            with open(self._weights_file, 'r') as f:
+                data = json.load(f)
+            self.set_phase_weights(data['phase_weights'], data['phase_cutoffs'])
+            if self._debug:
+                print(f'Loaded phase weights from {self._weights_file}')
+        except Exception as e:
+            if self._debug:
+                print(f'Phase weights load error: {e}')
+
+    def set_phase_weights(self, phase_weights, phase_cutoffs=None):
+        self._game_phase_weights = {
+            phase: {feature: float(phase_weights[phase][feature]) for feature in PHASE_FEATURES}
+            for phase in GAME_PHASES
+        }
+        if phase_cutoffs is not None:
+            self._phase_cutoffs = [float(cutoff) for cutoff in phase_cutoffs]
+
+        if self._transposition_table is not None:
+            self._transposition_table.clear()
+
+        if self._ponderer is not None:
+            self._ponderer.close()
+            self._ponderer = None
+        if self._parallel_search is not None:
+            self._parallel_search.shutdown()
+            self._parallel_search = None
+            self.start_search_workers()
+
+    def get_phase_weights(self):
+        return {
+            'phase_weights': {phase: dict(weights) for phase, weights in self._game_phase_weights.items()},
+            'phase_cutoffs': list(self._phase_cutoffs)
+        }
 
     def load_memory(self):
         try:
-            if os.path.exists(self._memory_file):
-                with open(self._memory_file, 'r') as f:
-                    return json.load(f)
+            return open_memory_store(self._memory_file, self._memory_max_states, self._memory_shard)
         except Exception as e:
             if self._debug:
                 print(f'Memory load error: {e}')
-        return {}
+        return open_memory_store(None, self._memory_max_states)
 
     def save_memory(self):
         try:
-            with open(self._memory_file, 'w') as f:
-                json.dump(self._memory, f, indent=2)
+            self._memory.flush()
         except Exception as e:
             if self._debug:
                 print(f"Memory save error: {e}")
 
+    def close(self):
+        super().close()
+        self._memory.close()
+
     def get_game_phase(self, max_tile):
-        if max_tile <= 24:
+        early_cutoff, mid_cutoff = self._phase_cutoffs
+        if max_tile <= early_cutoff:
             return 'early'
-        elif max_tile <= 192:
+        elif max_tile <= mid_cutoff:
             return 'mid'
         else:
             return 'late'
@@ -124,95 +190,59 @@ class MemoryStrategy(BaseStrategy):
         return bonus
 
     def evaluate_position(self, board):
-        max_tile = np.max(board)
-        phase = self.get_game_phase(max_tile)
-        weights = self._game_phase_weights[phase]
-
-        score = 0
-
-        free_cells = np.sum(board == 0)
-        score += free_cells * weights['free_cells'] * 10
-
-        max_tile_positions = np.argwhere(board == max_tile)
-        corner_bonus = 0
-        for pos in max_tile_positions:
-            distance_to_corner = min(pos[0] + pos[1], pos[0] + (3-pos[1]), (3-pos[0]) + pos[1], (3-pos[0]) + (3-pos[1]))
-            corner_bonus += (6 - distance_to_corner) * 5
-        score += corner_bonus * weights['max_corner']
-
-        monotonicity = self.calculate_monotonicity(board)
-        score += monotonicity * weights['monotonicity'] * 2
+        return self.evaluate_packed(bitboard.pack_board(board))
 
-        merge_potential = self.calculate_merge_potential(board)
-        score += merge_potential * weights['merges'] * 3
+    def evaluate_packed(self, packed):
+        features = evaluation_tables.memory_features(packed)
+        weights = self._game_phase_weights[self.get_game_phase(features['max_tile'])]
 
-        penalty_12 = self.calculate_isolated_12_penalty(board)
-        score -= penalty_12 * weights['penalty_12']
-
-        large_tiles_bonus = self.calculate_large_tiles_bonus(board)
-        score += large_tiles_bonus
+        score = 0
+        score += features['free_cells'] * weights['free_cells'] * 10
+        score += features['corner_bonus'] * weights['max_corner']
+        score += features['monotonicity'] * weights['monotonicity'] * 2
+        score += features['merge_potential'] * weights['merges'] * 3
+        score -= features['penalty_12'] * weights['penalty_12']
+        score += features['large_tiles_bonus']
 
         return score
 
     def board_to_hash(self, board, next_tile):
-        board_tuple = tuple(board.flatten())
-        return f'{board_tuple}_{next_tile}'
+        packed, symmetry = bitboard.canonicalize(bitboard.pack_board(board))
+        return (packed, int(next_tile)), symmetry
 
     def get_memory_advice(self, board, next_tile):
-        state_hash = self.board_to_hash(board, next_tile)
+        state_hash, symmetry = self.board_to_hash(board, next_tile)
         self._game_states_seen += 1
 
-        if state_hash in self._memory:
+        memory_data = self._memory.visit(state_hash)
+
+        if memory_data is not None:
             self._memory_hits += 1
-            memory_data = self._memory[state_hash]
-            memory_data['visit_count'] += 1
+            if symmetry:
+                self._transformed_hits += 1
 
             best_direction = None
             best_score = -1
 
-            for direction, move_data in memory_data['moves'].items():
-                if move_data['total_count'] > 0:
-                    success_rate = move_data['success_count'] / move_data['total_count']
-                    avg_score_change = np.mean(move_data['score_changes']) if move_data['score_changes'] else 0
+            for direction, move_data in memory_data.moves.items():
+                if move_data[COUNT] > 0:
+                    success_rate = move_data[SUCCESS] / move_data[COUNT]
 
-                    memory_score = success_rate * 100 + avg_score_change + move_data['max_score_achieved'] * 0.1
+                    memory_score = success_rate * 100 + move_data[MEAN] + move_data[MAX] * 0.1
 
                     if memory_score > best_score:
                         best_score = memory_score
                         best_direction = direction
 
             if best_direction and best_score > 50:
+                best_direction = bitboard.SYMMETRY_INVERSE_DIRECTIONS[symmetry][best_direction]
                 if self._debug:
                     print(f'Memory advice: {best_direction} (score: {best_score:.1f})')
                 return best_direction, best_score
 
         return None, 0
 
-    def evaluate_position_with_next_tile(self, board, next_tile, depth):
-        if depth <= 0:
-            return self.evaluate_position(board)
-
-        free_positions = [(i, j) for i in range(4) for j in range(4) if board[i, j] == 0]
-
-        if not free_positions:
-            return self.evaluate_position(board)
-
-        worst_score = float('inf')
-        evaluated_positions = min(2, len(free_positions))
-
-        for i in range(evaluated_positions):
-            pos = free_positions[i]
-            test_board = board.copy()
-            test_board[pos] = next_tile
-
-            score, _ = self.find_best_move(test_board, 0, depth-1)
-
-            if score < worst_score:
-                worst_score = score
-
-        return worst_score
-
-    def find_best_move(self, board, next_tile, depth=2):
+    def find_best_move(self, board, next_tile, depth=2, deadline=None):
         if isinstance(next_tile, str):
             try:
                 next_tile = int(next_tile)
@@ -221,36 +251,20 @@ class MemoryStrategy(BaseStrategy):
 
         memory_direction, memory_score = self.get_memory_advice(board, next_tile)
 
-        best_score = float('-inf')
-        best_direction = 'left'
-        valid_moves = []
-        move_scores = {}
-
-        for direction in ['left', 'right', 'up', 'down']:
-            new_board, changed = self.simulate_move(board, direction)
-
-            if not changed:
-                continue
+        move_scores = self.search_move_scores(board, next_tile, depth, deadline)
 
-            valid_moves.append(direction)
-
-            score = self.evaluate_position_with_next_tile(new_board, next_tile, depth-1)
-
-            if direction == memory_direction:
-                score += max(50, memory_score * 0.5)
-
-            move_scores[direction] = score
+        if not move_scores:
+            return float('-inf'), random.choice(['left', 'right', 'up', 'down'])
 
-            if score > best_score:
-                best_score = score
-                best_direction = direction
+        if memory_direction in move_scores:
+            move_scores[memory_direction] += max(50, memory_score * 0.5)
 
-        if not valid_moves:
-            return float('-inf'), random.choice(['left', 'right', 'up', 'down'])
+        best_direction = max(move_scores, key=move_scores.get)
+        best_score = move_scores[best_direction]
 
         max_tile = np.max(board)
         if max_tile < 48 and random.random() < 0.1:
-            exploration_direction = random.choice(valid_moves)
+            exploration_direction = random.choice(list(move_scores))
             if self._debug:
                 print(f'Exploring: {exploration_direction}')
             return move_scores[exploration_direction], exploration_direction
@@ -280,58 +294,14 @@ class MemoryStrategy(BaseStrategy):
         self.remember_successful_move(board, next_tile, direction, score_change, np.max(new_board))
 
     def remember_successful_move(self, board, next_tile, direction, score_change, result_score):
-        state_hash = self.board_to_hash(board, next_tile)
-
-        if state_hash not in self._memory:
-            self._memory[state_hash] = {
-                'moves': {},
-                'best_score': result_score,
-                'visit_count': 0
-            }
-
-        if direction not in self._memory[state_hash]['moves']:
-            self._memory[state_hash]['moves'][direction] = {
-                'score_changes': [],
-                'success_count': 0,
-                'total_count': 0,
-                'max_score_achieved': result_score
-            }
-
-        move_data = self._memory[state_hash]['moves'][direction]
-        move_data['score_changes'].append(score_change)
-        move_data['total_count'] += 1
-
-        if result_score > self._memory[state_hash]['best_score']:
-            self._memory[state_hash]['best_score'] = result_score
-
-        if result_score > move_data['max_score_achieved']:
-            move_data['max_score_achieved'] = result_score
-            move_data['success_count'] += 1
-
-        if len(move_data['score_changes']) > 10:
-            move_data['score_changes'] = move_data['score_changes'][-5:]
+        state_hash, symmetry = self.board_to_hash(board, next_tile)
+        direction = bitboard.SYMMETRY_DIRECTIONS[symmetry][direction]
+        self._memory.record(state_hash, direction, score_change, result_score)
 
     def remember_failed_move(self, board, next_tile, direction):
-        state_hash = self.board_to_hash(board, next_tile)
-
-        if state_hash not in self._memory:
-            self._memory[state_hash] = {
-                'moves': {},
-                'best_score': 0,
-                'visit_count': 0
-            }
-
-        if direction not in self._memory[state_hash]['moves']:
-            self._memory[state_hash]['moves'][direction] = {
-                'score_changes': [],
-                'success_count': 0,
-                'total_count': 0,
-                'max_score_achieved': 0
-            }
-
-        move_data = self._memory[state_hash]['moves'][direction]
-        move_data['total_count'] += 1
-        move_data['score_changes'].append(-10)
+        state_hash, symmetry = self.board_to_hash(board, next_tile)
+        direction = bitboard.SYMMETRY_DIRECTIONS[symmetry][direction]
+        self._memory.record(state_hash, direction, -10, 0, failed=True)
 
     def start_new_game(self, board):
         self._move_history = []
@@ -343,7 +313,9 @@ class MemoryStrategy(BaseStrategy):
 
         if self._debug:
             print(f'Memory stats: {self._memory_hits}/{self._game_states_seen} hits ({success_rate:.1%})')
-            print(f'Memory size: {len(self._memory)} states')
+            print(f'Memory size: {len(self._memory)} states, {self._memory.memory_bytes() / 1024:.0f} KiB in RAM')
+            if self._transposition_table is not None:
+                print(f'Transposition table: {self._transposition_table.get_stats()}')
 
         if max_tile >= 96:
             self.save_memory()
@@ -353,7 +325,10 @@ class MemoryStrategy(BaseStrategy):
     def get_memory_stats(self):
         return {
             'states_remembered': len(self._memory),
+            'store': self._memory.get_stats(),
             'memory_hits': self._memory_hits,
+            'transformed_hits': self._transformed_hits,
             'game_states_seen': self._game_states_seen,
             'hit_rate': self._memory_hits / max(1, self._game_states_seen)
         }
+
@@ -0,0 +1,91 @@
+import numpy as np
+import os
+
+from strategies import bitboard
+from strategies.search_strategy import SearchStrategy
+
+
+NTUPLE_WEIGHTS_FILE = './ntuple_weights.npy'
+
+TUPLES = ['row_edge', 'row_inner', 'square_corner', 'square_edge', 'square_center']
+TUPLE_SIZE = 1 << 16
+WEIGHTS_SHAPE = (len(TUPLES), TUPLE_SIZE)
+
+_OFFSETS = [k * TUPLE_SIZE for k in range(len(TUPLES))]
+
+
+def _build_row_scores():
+    rows = np.arange(TUPLE_SIZE, dtype=np.int64)
+    ranks = np.stack([(rows >> (4 * j)) & 0xF for j in range(4)], axis=1)
+    scores = np.where(ranks >= 3, 3 ** np.maximum(ranks - 2, 0), 0)
+    return scores.sum(axis=1).tolist()
+
+
+_ROW_SCORES = _build_row_scores()
+
+
+def board_score(packed):
+    return (
+        _ROW_SCORES[packed & 0xFFFF]
+        + _ROW_SCORES[(packed >> 16) & 0xFFFF]
+        + _ROW_SCORES[(packed >> 32) & 0xFFFF]
+        + _ROW_SCORES[packed >> 48]
+    )
+
+
+def tuple_indices(packed):
+    edge, inner, corner, side, center = _OFFSETS
+    indices = []
+
+    for board in bitboard.symmetries(packed):
+        row1 = board >> 16
+        indices.append(edge + (board & 0xFFFF))
+        indices.append(inner + (row1 & 0xFFFF))
+        indices.append(corner + ((board & 0xFF) | ((row1 & 0xFF) << 8)))
+        indices.append(side + (((board >> 4) & 0xFF) | (((row1 >> 4) & 0xFF) << 8)))
+        indices.append(center + (((row1 >> 4) & 0xFF) | (((row1 >> 20) & 0xFF) << 8)))
+
+    return indices
+
+
+def new_weights():
+    return np.zeros(WEIGHTS_SHAPE, dtype=np.float32)
+
+
+def load_weights(path):
+    weights = np.load(path)
+    if weights.shape != WEIGHTS_SHAPE:
+        raise ValueError(f'{path} has shape {weights.shape}, expected n-tuple weights of shape {WEIGHTS_SHAPE}')
+    return weights
+
+
+class NTupleStrategy(SearchStrategy):
+    def __init__(self, debug=True, engine='numpy', transposition_table_size=1 << 18, search_workers=0,
+                 weights_file=NTUPLE_WEIGHTS_FILE):
+        super().__init__(debug, engine, transposition_table_size, search_workers)
+
+        self._weights_file = weights_file
+
+        if weights_file and os.path.exists(weights_file):
+            weights = load_weights(weights_file)
+        else:
+            weights = new_weights()
+            if debug:
+                print(f'N-tuple weights not found at {weights_file}, evaluating by board score only. '
+                      f'Train them with train_ntuple.py')
+
+        self._weights = weights.ravel().tolist()
+
+        self.start_search_workers()
+
+    def worker_kwargs(self):
+        kwargs = super().worker_kwargs()
+        kwargs['weights_file'] = self._weights_file
+        return kwargs
+
+    def evaluate_position(self, board):
+        return self.evaluate_packed(bitboard.pack_board(board))
+
+    def evaluate_packed(self, packed):
+        weights = self._weights
+        return board_score(packed) + sum(weights[index] for index in tuple_indices(packed))
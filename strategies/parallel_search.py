@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from strategies.base_strategy import spawn_cells
+
+
+_worker_strategy = None
+
+
+def _init_worker(strategy_class, strategy_kwargs):
+    global _worker_strategy
+    _worker_strategy = strategy_class(**strategy_kwargs)
+
+
+def _warm_up():
+    return _worker_strategy is not None
+
+
+def _search_child(child, depth, deadline):
+    return _worker_strategy.search_spawn_child(child, depth, deadline)
+
+
+class ParallelSearch:
+    def __init__(self, strategy_class, strategy_kwargs, workers):
+        if workers <= 0:
+            raise ValueError(f'Parallel search needs at least one worker, got {workers}')
+
+        self._workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(strategy_class, strategy_kwargs)
+        )
+
+        for future in [self._executor.submit(_warm_up) for _ in range(workers)]:
+            future.result()
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def search_root(self, strategy, board, next_tile, depth, first=None, deadline=None):
+        tasks = []
+
+        for direction in strategy.ordered_directions(first):
+            new_board, moved_lines = strategy.simulate_move_lines(board, direction)
+
+            if not any(moved_lines):
+                continue
+
+            children = strategy.spawn_children(new_board, next_tile, spawn_cells(direction, moved_lines))
+
+            if depth <= 1 or len(children) == 0:
+                tasks.append((direction, strategy.evaluate_position(new_board)))
+                continue
+
+            futures = [self._executor.submit(_search_child, child, depth-2, deadline) for child in children]
+            tasks.append((direction, futures))
+
+        move_scores = {}
+        timed_out = False
+
+        for direction, task in tasks:
+            if not isinstance(task, list):
+                move_scores[direction] = task
+                continue
+
+            scores = [future.result() for future in task]
+            if any(score is None for score in scores):
+                timed_out = True
+                continue
+
+            move_scores[direction] = min(scores)
+
+        if timed_out:
+            return None
+
+        return move_scores
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,105 @@
+import threading
+
+from strategies import bitboard
+from strategies.base_strategy import spawn_cells
+
+
+class Ponderer:
+    def __init__(self, strategy, spawn_tiles):
+        self._strategy = strategy
+        self._helper = type(strategy)(**strategy.worker_kwargs())
+        self._spawn_tiles = spawn_tiles
+
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+        self._helper.set_cancel_event(self._cancel_event)
+
+        self._hits = 0
+        self._misses = 0
+        self._searched = 0
+        self._cancelled = 0
+
+    @staticmethod
+    def make_key(board, next_tile, depth):
+        return bitboard.pack_board(board), next_tile, depth
+
+    def successor_positions(self, board, direction, next_tile):
+        predicted_board, moved_lines = self._strategy.simulate_move_lines(board, direction)
+
+        positions = []
+        for i, j in spawn_cells(direction, moved_lines):
+            child = predicted_board.copy()
+            child[i, j] = next_tile
+            for tile in self._spawn_tiles:
+                positions.append((child, tile))
+
+        return positions
+
+    def start(self, board, direction, next_tile, depth_for):
+        self.cancel()
+
+        tasks = [
+            (child, tile, depth_for(child))
+            for child, tile in self.successor_positions(board, direction, next_tile)
+        ]
+
+        with self._lock:
+            self._cache = {}
+
+        self._cancel_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(tasks,), daemon=True)
+        self._thread.start()
+
+    def _run(self, tasks):
+        for board, next_tile, depth in tasks:
+            if self._cancel_event.is_set():
+                return
+
+            move_scores = self._helper.ponder_move_scores(board, next_tile, depth)
+            if move_scores is None:
+                return
+
+            with self._lock:
+                self._cache[self.make_key(board, next_tile, depth)] = move_scores
+                self._searched += 1
+
+    def cancel(self):
+        if self._thread is None:
+            return
+
+        if self._thread.is_alive():
+            self._cancel_event.set()
+            self._cancelled += 1
+
+        self._thread.join()
+        self._thread = None
+
+    def lookup(self, board, next_tile, depth):
+        self.cancel()
+
+        with self._lock:
+            move_scores = self._cache.get(self.make_key(board, next_tile, depth))
+
+        if move_scores is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return dict(move_scores)
+
+    def close(self):
+        self.cancel()
+        self._helper.close()
+
+    def get_stats(self):
+        lookups = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+            'searched': self._searched,
+            'cancelled': self._cancelled
+        }
@@ -0,0 +1,272 @@
+import numpy as np
+import random
+import time
+
+from strategies import bitboard
+from strategies.base_strategy import BaseStrategy, spawn_cells
+from strategies.parallel_search import ParallelSearch
+from strategies.ponderer import Ponderer
+from strategies.transposition_table import TranspositionTable
+
+
+SPAWN_TILES = [1, 2, 3]
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchStrategy(BaseStrategy):
+    def __init__(self, debug=True, engine='numpy', transposition_table_size=1 << 18, search_workers=0):
+        super().__init__(debug, engine)
+
+        self._transposition_table_size = transposition_table_size
+        self._transposition_table = TranspositionTable(transposition_table_size) if transposition_table_size else None
+        self._deadline = None
+        self._cancel_event = None
+        self._last_search_depth = 0
+        self._ponderer = None
+
+        self._search_workers = search_workers
+        self._parallel_search = None
+
+    def worker_kwargs(self):
+        return {
+            'debug': False,
+            'engine': self._engine,
+            'transposition_table_size': self._transposition_table_size
+        }
+
+    def start_search_workers(self):
+        if self._search_workers > 0 and self._parallel_search is None:
+            self._parallel_search = ParallelSearch(type(self), self.worker_kwargs(), self._search_workers)
+        return self._parallel_search
+
+    def set_cancel_event(self, cancel_event):
+        self._cancel_event = cancel_event
+
+    def start_pondering(self):
+        if self._ponderer is None:
+            self._ponderer = Ponderer(self, SPAWN_TILES)
+        return self._ponderer
+
+    def ponder(self, board, direction, next_tile, depth_for):
+        self.start_pondering().start(board, direction, next_tile, depth_for)
+
+    def ponder_move_scores(self, board, next_tile, depth):
+        try:
+            return self.search_move_scores(board, next_tile, depth)
+        except SearchTimeout:
+            return None
+
+    def close(self):
+        if self._ponderer is not None:
+            self._ponderer.close()
+            self._ponderer = None
+
+        if self._parallel_search is not None:
+            self._parallel_search.shutdown()
+            self._parallel_search = None
+
+    def evaluate_position_with_next_tile(self, board, next_tile, depth, spawn_positions=None):
+        if depth <= 0:
+            return self.evaluate_position(board)
+
+        self._check_deadline()
+
+        children = self.spawn_children(board, next_tile, spawn_positions)
+
+        if len(children) == 0:
+            return self.evaluate_position(board)
+
+        if depth <= 2:
+            scores = self._evaluate_best_replies_batch(children, depth-1)
+        else:
+            scores = [self._search_best_move(child, 0, depth-1)[0] for child in children]
+
+        return min(scores)
+
+    def spawn_children(self, board, next_tile, spawn_positions=None):
+        if spawn_positions is None:
+            spawn_positions = [tuple(pos) for pos in np.argwhere(board == 0)]
+
+        if not spawn_positions:
+            return board[np.newaxis][:0]
+
+        spawn_tiles = [next_tile] if next_tile else SPAWN_TILES
+        rows, columns, tiles = zip(*[(i, j, tile) for i, j in spawn_positions for tile in spawn_tiles])
+
+        children = np.repeat(board[np.newaxis], len(tiles), axis=0)
+        children[np.arange(len(tiles)), rows, columns] = tiles
+
+        return children
+
+    def search_spawn_child(self, child, depth, deadline=None):
+        self._deadline = deadline
+        try:
+            return self._search_best_move(child, 0, depth)[0]
+        except SearchTimeout:
+            return None
+        finally:
+            self._deadline = None
+
+    def _evaluate_best_replies_batch(self, boards, depth):
+        best_scores = np.full(len(boards), float('-inf'))
+        best_directions = [None] * len(boards)
+        pending = np.arange(len(boards))
+
+        if self._transposition_table is not None:
+            keys = [TranspositionTable.make_key(bitboard.pack_board(board), 0) for board in boards]
+            cached = [self._transposition_table.lookup(key, depth) for key in keys]
+
+            for k, entry in enumerate(cached):
+                if entry is not None:
+                    best_scores[k] = entry[0]
+
+            pending = np.array([k for k, entry in enumerate(cached) if entry is None], dtype=int)
+            if len(pending) == 0:
+                return best_scores
+
+        for direction in ['left', 'right', 'up', 'down']:
+            new_boards, changed = self.simulate_moves_batch(boards[pending], direction)
+
+            for idx in np.flatnonzero(changed):
+                k = pending[idx]
+                score = self.evaluate_position(new_boards[idx])
+                if score > best_scores[k]:
+                    best_scores[k] = score
+                    best_directions[k] = direction
+
+        if self._transposition_table is not None:
+            for k in pending:
+                self._transposition_table.store(keys[k], depth, float(best_scores[k]), best_directions[k])
+
+        return best_scores
+
+    def _search_best_move(self, board, next_tile, depth):
+        self._check_deadline()
+
+        key = None
+        first = None
+        if self._transposition_table is not None:
+            key = TranspositionTable.make_key(bitboard.pack_board(board), next_tile)
+            cached = self._transposition_table.lookup(key, depth)
+            if cached is not None:
+                return cached
+            first = self._transposition_table.best_move(key)
+
+        best_score = float('-inf')
+        best_direction = None
+
+        for direction in self.ordered_directions(first):
+            new_board, moved_lines = self.simulate_move_lines(board, direction)
+
+            if not any(moved_lines):
+                continue
+
+            score = self.evaluate_position_with_next_tile(
+                new_board, next_tile, depth-1, spawn_cells(direction, moved_lines))
+
+            if score > best_score:
+                best_score = score
+                best_direction = direction
+
+        if key is not None:
+            self._transposition_table.store(key, depth, best_score, best_direction)
+
+        return best_score, best_direction
+
+    def _check_deadline(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise SearchTimeout()
+
+    def ordered_directions(self, first=None):
+        directions = ['left', 'right', 'up', 'down']
+        if first in directions:
+            directions.remove(first)
+            directions.insert(0, first)
+        return directions
+
+    def search_root(self, board, next_tile, depth, first=None):
+        parallel_search = self.start_search_workers()
+        if parallel_search is not None and depth > 1:
+            move_scores = parallel_search.search_root(self, board, next_tile, depth, first, self._deadline)
+            if move_scores is None:
+                raise SearchTimeout()
+            return move_scores
+
+        move_scores = {}
+
+        for direction in self.ordered_directions(first):
+            new_board, moved_lines = self.simulate_move_lines(board, direction)
+
+            if not any(moved_lines):
+                continue
+
+            move_scores[direction] = self.evaluate_position_with_next_tile(
+                new_board, next_tile, depth-1, spawn_cells(direction, moved_lines))
+
+        return move_scores
+
+    def search_iterative(self, board, next_tile, max_depth, deadline):
+        move_scores = {}
+        best_direction = None
+
+        for depth in [1] + list(range(2, max_depth + 1, 2)):
+            self._deadline = deadline if move_scores else None
+            try:
+                move_scores = self.search_root(board, next_tile, depth, first=best_direction)
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+
+            self._last_search_depth = depth
+
+            if not move_scores:
+                break
+
+            best_direction = max(move_scores, key=move_scores.get)
+
+            if time.perf_counter() >= deadline:
+                break
+
+        return move_scores
+
+    def search_move_scores(self, board, next_tile, depth=2, deadline=None):
+        if self._ponderer is not None:
+            if deadline is None:
+                move_scores = self._ponderer.lookup(board, next_tile, depth)
+                if move_scores is not None:
+                    self._last_search_depth = depth
+                    return move_scores
+            else:
+                self._ponderer.cancel()
+
+        if self._transposition_table is not None:
+            self._transposition_table.new_search()
+
+        if deadline is None:
+            self._last_search_depth = depth
+            return self.search_root(board, next_tile, depth)
+
+        return self.search_iterative(board, next_tile, depth, deadline)
+
+    def find_best_move(self, board, next_tile, depth=2, deadline=None):
+        move_scores = self.search_move_scores(board, next_tile, depth, deadline)
+
+        if not move_scores:
+            return float('-inf'), random.choice(['left', 'right', 'up', 'down'])
+
+        best_direction = max(move_scores, key=move_scores.get)
+        return move_scores[best_direction], best_direction
+
+    def get_search_stats(self):
+        stats = {'last_search_depth': self._last_search_depth}
+        if self._transposition_table is not None:
+            stats['transposition_table'] = self._transposition_table.get_stats()
+        if self._ponderer is not None:
+            stats['ponder'] = self._ponderer.get_stats()
+        return stats
@@ -1,13 +1,12 @@
-import numpy as np
-
+from strategies import bitboard, evaluation_tables
 from strategies.base_strategy import BaseStrategy
 
 
 class SimpleStrategy(BaseStrategy):
-    def __init__(self, debug=True):
-        super().__init__(debug)
+    def __init__(self, debug=True, engine='numpy'):
+        super().__init__(debug, engine)
 
-    def find_best_move(self, board):
+    def find_best_move(self, board, next_tile=None, depth=1, deadline=None):
         best_score = float('-inf')
         best_direction = 'left'
 
@@ -26,30 +25,17 @@ class SimpleStrategy(BaseStrategy):
         return best_score, best_direction
 
     def evaluate_position(self, board):
-        score = 0
+        return self.evaluate_packed(bitboard.pack_board(board))
+
+    def evaluate_packed(self, packed):
+        features = evaluation_tables.simple_features(packed)
 
-        free_cells = np.sum(board == 0)
-        score += free_cells * 20
+        score = features['free_cells'] * 20
 
-        if board[0, 0] == np.max(board):
+        if features['max_in_corner']:
             score += 50
 
-        for i in range(4):
-            for j in range(3):
-                if board[i, j] >= board[i, j+1] and board[i, j] > 0:
-                    score += 5
-
-        for i in range(4):
-            for j in range(4):
-                if board[i, j] in [1, 2]:
-                    has_partner = False
-                    for dx, dy in [(0, 1), (1, 0)]:
-                        ni, nj = i+dx, j+dy
-                        if 0 <= ni < 4 and 0 <= nj < 4:
-                            if self.can_merge(board[i, j], board[ni, nj]):
-                                has_partner = True
-                                break
-                    if not has_partner:
-                        score -= 10
+        score += features['monotonicity'] * 5
+        score -= features['isolated_12'] * 10
 
         return score
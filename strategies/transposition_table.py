@@ -0,0 +1,93 @@
+import sys
+
+from strategies import bitboard
+
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+
+
+class TranspositionTable:
+    def __init__(self, size=1 << 18):
+        if size <= 0 or size & (size - 1):
+            raise ValueError(f'Transposition table size must be a power of two, got {size}')
+
+        self._size = size
+        self._shift = 64 - (size.bit_length() - 1)
+        self._keys = [None] * size
+        self._entries = [None] * size
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._replacements = 0
+        self._rejected = 0
+
+    @staticmethod
+    def make_key(packed_board, next_tile):
+        return packed_board | (bitboard.tile_to_rank(next_tile) << 64)
+
+    def _slot(self, key):
+        return (((key ^ (key >> 32)) * _HASH_MULTIPLIER) & _MASK_64) >> self._shift
+
+    def new_search(self):
+        self._generation += 1
+
+    def lookup(self, key, depth):
+        slot = self._slot(key)
+
+        if self._keys[slot] == key:
+            stored_depth, value, best_move, _ = self._entries[slot]
+            if stored_depth == depth:
+                self._hits += 1
+                return value, best_move
+
+        self._misses += 1
+        return None
+
+    def best_move(self, key):
+        slot = self._slot(key)
+        if self._keys[slot] == key:
+            return self._entries[slot][2]
+        return None
+
+    def store(self, key, depth, value, best_move):
+        slot = self._slot(key)
+        stored_key = self._keys[slot]
+
+        if stored_key is not None and stored_key != key:
+            stored_depth, _, _, stored_generation = self._entries[slot]
+            if stored_generation == self._generation and stored_depth > depth:
+                self._rejected += 1
+                return
+            self._replacements += 1
+
+        self._keys[slot] = key
+        self._entries[slot] = (depth, value, best_move, self._generation)
+        self._stores += 1
+
+    def clear(self):
+        self._keys = [None] * self._size
+        self._entries = [None] * self._size
+
+    def get_stats(self):
+        filled = self._size - self._keys.count(None)
+        lookups = self._hits + self._misses
+
+        entry_bytes = 0
+        for key, entry in zip(self._keys, self._entries):
+            if key is not None:
+                entry_bytes += sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+
+        return {
+            'size': self._size,
+            'entries': filled,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / max(1, lookups),
+            'stores': self._stores,
+            'replacements': self._replacements,
+            'rejected': self._rejected,
+            'bytes': sys.getsizeof(self._keys) + sys.getsizeof(self._entries) + entry_bytes
+        }
@@ -0,0 +1,80 @@
+import numpy as np
+
+from strategies.memory_strategy import MemoryStrategy
+from strategies.simple_strategy import SimpleStrategy
+
+
+TILE_VALUES = [0, 0, 0, 0, 1, 2, 3, 6, 12, 24, 48, 96, 192, 384, 768]
+
+
+def sample_boards(count=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    boards = [rng.choice(TILE_VALUES, size=(4, 4)) for _ in range(count)]
+
+    boards.append(np.zeros((4, 4), dtype=int))
+    boards.append(np.array([[384, 192, 96, 48], [3, 6, 12, 24], [1, 2, 1, 2], [2, 1, 2, 1]]))
+    boards.append(np.array([[1, 1, 1, 1], [1, 1, 1, 1], [2, 2, 2, 2], [0, 0, 0, 3]]))
+
+    return boards
+
+
+def memory_reference_score(strategy, board):
+    max_tile = np.max(board)
+    weights = strategy._game_phase_weights[strategy.get_game_phase(max_tile)]
+
+    score = 0
+    score += np.sum(board == 0) * weights['free_cells'] * 10
+
+    corner_bonus = 0
+    for pos in np.argwhere(board == max_tile):
+        distance_to_corner = min(pos[0] + pos[1], pos[0] + (3-pos[1]), (3-pos[0]) + pos[1], (3-pos[0]) + (3-pos[1]))
+        corner_bonus += (6 - distance_to_corner) * 5
+    score += corner_bonus * weights['max_corner']
+
+    score += strategy.calculate_monotonicity(board) * weights['monotonicity'] * 2
+    score += strategy.calculate_merge_potential(board) * weights['merges'] * 3
+    score -= strategy.calculate_isolated_12_penalty(board) * weights['penalty_12']
+    score += strategy.calculate_large_tiles_bonus(board)
+
+    return score
+
+
+def simple_reference_score(strategy, board):
+    score = np.sum(board == 0) * 20
+
+    if board[0, 0] == np.max(board):
+        score += 50
+
+    for i in range(4):
+        for j in range(3):
+            if board[i, j] >= board[i, j+1] and board[i, j] > 0:
+                score += 5
+
+    for i in range(4):
+        for j in range(4):
+            if board[i, j] in [1, 2]:
+                has_partner = False
+                for dx, dy in [(0, 1), (1, 0)]:
+                    ni, nj = i+dx, j+dy
+                    if 0 <= ni < 4 and 0 <= nj < 4:
+                        if strategy.can_merge(board[i, j], board[ni, nj]):
+                            has_partner = True
+                            break
+                if not has_partner:
+                    score -= 10
+
+    return score
+
+
+def test_memory_strategy_table_evaluation_matches_reference(tmp_path):
+    strategy = MemoryStrategy(debug=False, memory_file=str(tmp_path / 'game_memory.json'))
+
+    for board in sample_boards():
+        assert strategy.evaluate_position(board) == memory_reference_score(strategy, board), board
+
+
+def test_simple_strategy_table_evaluation_matches_reference():
+    strategy = SimpleStrategy(debug=False)
+
+    for board in sample_boards():
+        assert strategy.evaluate_position(board) == simple_reference_score(strategy, board), board
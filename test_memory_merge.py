@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from collections import defaultdict
+from strategies.memory_store import (
+    DIRECTIONS, MmapMemoryStore, ShardMemoryStore, find_shards, load_records, merge_memory_shards, record_to_state,
+    shard_path
+)
+
+
+def record_games(store, reference, rng, moves=600):
+    for _ in range(moves):
+        key = (int(rng.integers(0, 60)), int(rng.integers(1, 4)))
+        direction = DIRECTIONS[int(rng.integers(0, 4))]
+        score_change = float(rng.integers(-20, 40))
+        result_score = int(rng.integers(1, 200))
+
+        if store.visit(key) is not None:
+            reference[key]['visits'] += 1
+        store.record(key, direction, score_change, result_score)
+
+        reference[key]['best_score'] = max(reference[key]['best_score'], result_score)
+        reference[key][direction].append(score_change)
+
+    store.flush()
+
+
+def test_shard_merge_matches_reference_tally(tmp_path):
+    path = str(tmp_path / 'game_memory.npy')
+    rng = np.random.default_rng(0)
+    reference = defaultdict(lambda: {'visits': 0, 'best_score': 0, **{direction: [] for direction in DIRECTIONS}})
+
+    record_games(MmapMemoryStore(path, max_states=16), reference, rng)
+
+    for worker in (1, 2):
+        store = ShardMemoryStore(path, shard_path(path, worker), max_states=16)
+        record_games(store, reference, rng)
+        assert store._evicted > 0
+
+    shards = find_shards(path)
+    assert len(shards) == 2
+    assert merge_memory_shards([path] + shards, path) == len(reference)
+
+    records = load_records(path)
+    assert len(records) == len(reference)
+
+    for record in records:
+        key = (int(record['board']), int(record['next_tile']))
+        expected = reference[key]
+        state = record_to_state(record)
+
+        assert state.visits == expected['visits'], key
+        assert state.best_score == expected['best_score'], key
+        for direction in DIRECTIONS:
+            move = state.get_move(direction)
+            changes = expected[direction]
+            if not changes:
+                assert move is None, (key, direction)
+                continue
+
+            assert move[0] == len(changes), (key, direction)
+            assert move[2] == pytest.approx(np.mean(changes)), (key, direction)
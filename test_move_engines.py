@@ -0,0 +1,48 @@
+import numpy as np
+
+from strategies.simple_strategy import SimpleStrategy
+
+
+TILE_VALUES = [0, 0, 0, 0, 1, 2, 3, 6, 12, 24, 48, 96, 192, 384, 768]
+DIRECTIONS = ['left', 'right', 'up', 'down']
+
+
+def sample_boards(count=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    boards = [rng.choice(TILE_VALUES, size=(4, 4)) for _ in range(count)]
+
+    boards.append(np.zeros((4, 4), dtype=int))
+    boards.append(np.array([[384, 192, 96, 48], [3, 6, 12, 24], [1, 2, 1, 2], [2, 1, 2, 1]]))
+    boards.append(np.array([[1, 1, 1, 1], [1, 1, 1, 1], [2, 2, 2, 2], [0, 0, 0, 3]]))
+    boards.append(np.array([[1, 3, 1, 3], [3, 1, 3, 1], [1, 3, 1, 3], [3, 1, 3, 1]]))
+
+    return boards
+
+
+def test_bitboard_engine_matches_numpy_engine():
+    numpy_strategy = SimpleStrategy(debug=False, engine='numpy')
+    bitboard_strategy = SimpleStrategy(debug=False, engine='bitboard')
+
+    for board in sample_boards():
+        for direction in DIRECTIONS:
+            numpy_board, numpy_lines = numpy_strategy.simulate_move_lines(board, direction)
+            bitboard_board, bitboard_lines = bitboard_strategy.simulate_move_lines(board, direction)
+
+            assert np.array_equal(numpy_board, bitboard_board), (board, direction)
+            assert list(numpy_lines) == list(bitboard_lines), (board, direction)
+
+        assert numpy_strategy.is_game_over(board) == bitboard_strategy.is_game_over(board), board
+
+
+def test_batch_moves_match_single_moves():
+    strategy = SimpleStrategy(debug=False)
+    boards = np.array(sample_boards())
+
+    for direction in DIRECTIONS:
+        new_boards, changed = strategy.simulate_moves_batch(boards, direction)
+
+        for board, new_board, moved in zip(boards, new_boards, changed):
+            expected_board, expected_moved = strategy.simulate_move(board, direction)
+
+            assert np.array_equal(new_board, expected_board), (board, direction)
+            assert moved == expected_moved, (board, direction)
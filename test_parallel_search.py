@@ -0,0 +1,30 @@
+import numpy as np
+
+from strategies.memory_strategy import MemoryStrategy
+
+
+BOARDS = [
+    np.array([[3, 6, 12, 0], [1, 2, 3, 6], [2, 1, 0, 3], [0, 3, 6, 12]]),
+    np.array([[48, 24, 12, 6], [3, 0, 1, 2], [0, 2, 0, 1], [1, 0, 0, 3]]),
+    np.array([[1, 2, 3, 6], [0, 0, 0, 0], [0, 3, 0, 0], [2, 0, 0, 1]])
+]
+
+
+def test_parallel_search_matches_serial_search():
+    serial = MemoryStrategy(debug=False, memory_file=None)
+    parallel = MemoryStrategy(debug=False, memory_file=None, search_workers=2)
+    uncached = MemoryStrategy(debug=False, memory_file=None, transposition_table_size=0)
+
+    try:
+        for board in BOARDS:
+            for next_tile in (1, 3):
+                for depth in (2, 4):
+                    expected = serial.search_move_scores(board, next_tile, depth)
+
+                    assert parallel.search_move_scores(board, next_tile, depth) == expected, (board, next_tile, depth)
+                    assert parallel.search_move_scores(board, next_tile, depth) == expected, (board, next_tile, depth)
+                    assert uncached.search_move_scores(board, next_tile, depth) == expected, (board, next_tile, depth)
+    finally:
+        serial.close()
+        parallel.close()
+        uncached.close()
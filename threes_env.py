@@ -0,0 +1,107 @@
+import numpy as np
+import random
+
+from strategies import bitboard
+from strategies.base_strategy import spawn_cells
+
+
+DECK = [1, 2, 3] * 4
+INITIAL_TILES = 9
+BONUS_CHANCE = 1 / 21
+BONUS_MIN_MAX_TILE = 48
+
+
+class ThreesEnv:
+    def __init__(self, seed=None):
+        self._rng = random.Random(seed)
+        self._deck = []
+        self._board = 0
+        self._next_tile = 0
+        self._move_count = 0
+        self._done = False
+
+        self.reset()
+
+    @property
+    def board(self):
+        return bitboard.unpack_board(self._board)
+
+    @property
+    def next_tile(self):
+        return self._next_tile
+
+    @property
+    def move_count(self):
+        return self._move_count
+
+    @property
+    def done(self):
+        return self._done
+
+    def _draw_from_deck(self):
+        if not self._deck:
+            self._deck = list(DECK)
+            self._rng.shuffle(self._deck)
+        return self._deck.pop()
+
+    def _draw_next_tile(self):
+        max_tile = self.max_tile()
+
+        if max_tile >= BONUS_MIN_MAX_TILE and self._rng.random() < BONUS_CHANCE:
+            bonus_tiles = []
+            tile = 6
+            while tile <= max_tile // 8:
+                bonus_tiles.append(tile)
+                tile *= 2
+            return self._rng.choice(bonus_tiles)
+
+        return self._draw_from_deck()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self._rng.seed(seed)
+
+        self._deck = []
+        self._move_count = 0
+        self._done = False
+
+        board = np.zeros(16, dtype=int)
+        for cell in self._rng.sample(range(16), INITIAL_TILES):
+            board[cell] = self._draw_from_deck()
+
+        self._board = bitboard.pack_board(board.reshape(4, 4))
+        self._next_tile = self._draw_next_tile()
+
+        return self.board, self._next_tile
+
+    def legal_moves(self):
+        return [direction for direction in bitboard.DIRECTIONS if bitboard.move(self._board, direction) != self._board]
+
+    def step(self, direction):
+        if self._done:
+            raise RuntimeError('Game is over, call reset() to start a new game')
+
+        new_board = bitboard.move(self._board, direction)
+        moved_lines = bitboard.moved_lines(self._board, new_board, direction)
+
+        if not any(moved_lines):
+            return self.board, self._next_tile, self._done, {'moved': False, 'spawn': None}
+
+        spawn = self._rng.choice(spawn_cells(direction, moved_lines))
+        i, j = spawn
+        new_board |= bitboard.tile_to_rank(self._next_tile) << (4 * (4 * i + j))
+
+        self._board = new_board
+        self._move_count += 1
+        self._next_tile = self._draw_next_tile()
+        self._done = bitboard.is_game_over(self._board)
+
+        return self.board, self._next_tile, self._done, {'moved': True, 'spawn': spawn}
+
+    def max_tile(self):
+        return int(self.board.max())
+
+    def score(self):
+        board = self.board
+        tiles = board[board >= 3]
+        return int(np.sum(3 ** (np.log2(tiles // 3).astype(int) + 1)))
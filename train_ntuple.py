@@ -0,0 +1,123 @@
+import argparse
+import numpy as np
+import os
+import random
+import time
+
+from strategies import bitboard
+from strategies.ntuple_strategy import NTUPLE_WEIGHTS_FILE, board_score, load_weights, new_weights, tuple_indices
+from threes_env import ThreesEnv
+
+
+def choose_afterstate(weights, packed):
+    best = None
+
+    for direction in bitboard.DIRECTIONS:
+        afterstate = bitboard.move(packed, direction)
+        if afterstate == packed:
+            continue
+
+        indices = tuple_indices(afterstate)
+        reward = board_score(afterstate) - board_score(packed)
+        value = reward + float(weights[indices].sum())
+
+        if best is None or value > best[0]:
+            best = (value, direction, reward, indices)
+
+    return best
+
+
+def td_update(weights, indices, target, alpha):
+    error = target - float(weights[indices].sum())
+    np.add.at(weights, indices, alpha * error / len(indices))
+    return error
+
+
+def train_episode(weights, env, alpha):
+    env.reset()
+    packed = bitboard.pack_board(env.board)
+
+    choice = choose_afterstate(weights, packed)
+    while choice is not None:
+        _, direction, _, indices = choice
+
+        env.step(direction)
+        packed = bitboard.pack_board(env.board)
+
+        choice = None if env.done else choose_afterstate(weights, packed)
+        if choice is None:
+            td_update(weights, indices, 0.0, alpha)
+        else:
+            _, _, reward, next_indices = choice
+            td_update(weights, indices, reward + float(weights[next_indices].sum()), alpha)
+
+    return env.score(), env.max_tile(), env.move_count
+
+
+def train(weights_file=NTUPLE_WEIGHTS_FILE, games=10000, alpha=0.1, seed=0, resume=False, checkpoint_every=1000,
+          log_every=100):
+    if resume and os.path.exists(weights_file):
+        weights = load_weights(weights_file).ravel()
+    else:
+        weights = new_weights().ravel()
+
+    if os.path.dirname(weights_file):
+        os.makedirs(os.path.dirname(weights_file), exist_ok=True)
+
+    random.seed(seed)
+    env = ThreesEnv(seed=seed)
+
+    scores = []
+    max_tiles = []
+    start_time = time.perf_counter()
+
+    for game in range(1, games + 1):
+        score, max_tile, _ = train_episode(weights, env, alpha)
+        scores.append(score)
+        max_tiles.append(max_tile)
+
+        if game % log_every == 0:
+            print(f'Game {game}: mean score {np.mean(scores[-log_every:]):.0f}, '
+                  f'max tile {max(max_tiles[-log_every:])}, '
+                  f'{game / (time.perf_counter() - start_time):.1f} games/sec')
+
+        if game % checkpoint_every == 0 or game == games:
+            np.save(weights_file, weights.reshape(new_weights().shape))
+
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train n-tuple network weights by TD(0) self-play')
+    parser.add_argument(
+        '-n', '--games', type=int, default=10000,
+        help='Number of self-play games (default: 10000)')
+    parser.add_argument(
+        '-a', '--alpha', type=float, default=0.1,
+        help='Learning rate, spread over the features of a position (default: 0.1)')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed of the headless simulator (default: 0)')
+    parser.add_argument(
+        '-o', '--output', default=NTUPLE_WEIGHTS_FILE,
+        help=f'Weights file (default: {NTUPLE_WEIGHTS_FILE})')
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='Continue training from the existing weights file')
+    parser.add_argument(
+        '--checkpoint-every', type=int, default=1000,
+        help='Save the weights every this many games (default: 1000)')
+    parser.add_argument(
+        '--log-every', type=int, default=100,
+        help='Print progress every this many games (default: 100)')
+
+    args = parser.parse_args()
+
+    train(
+        weights_file=args.output, games=args.games, alpha=args.alpha, seed=args.seed, resume=args.resume,
+        checkpoint_every=args.checkpoint_every, log_every=args.log_every
+    )
+
+
+if __name__ == '__main__':
+    main()
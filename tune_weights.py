@@ -0,0 +1,288 @@
+import argparse
+import json
+import numpy as np
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from benchmark import play_headless_game
+from strategies.base_strategy import ENGINES
+from strategies.memory_strategy import GAME_PHASES, MEMORY_WEIGHTS_FILE, PHASE_FEATURES, MemoryStrategy
+
+
+CUTOFF_BASE_TILE = 3
+PARAMETER_COUNT = len(GAME_PHASES) * len(PHASE_FEATURES) + 2
+VALIDATION_SEED_OFFSET = 1 << 20
+
+_worker_strategy = None
+
+
+class CMAES:
+    def __init__(self, mean, sigma, population_size=None, seed=0):
+        n = len(mean)
+
+        self.mean = np.array(mean, dtype=float)
+        self.sigma = float(sigma)
+        self.seed = seed
+        self.generation = 0
+
+        self.population_size = population_size or 4 + int(3 * np.log(n))
+        self.mu = self.population_size // 2
+
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1 / np.sum(self.weights ** 2)
+
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+
+    def _eigen(self):
+        eigenvalues, B = np.linalg.eigh(self.C)
+        return B, np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+    def ask(self):
+        B, D = self._eigen()
+        rng = np.random.default_rng([self.seed, self.generation])
+        z = rng.standard_normal((self.population_size, len(self.mean)))
+        return self.mean + self.sigma * (z * D) @ B.T
+
+    def tell(self, candidates, fitnesses):
+        n = len(self.mean)
+        order = np.argsort(fitnesses)
+        selected = np.asarray(candidates)[order[:self.mu]]
+
+        old_mean = self.mean
+        self.mean = self.weights @ selected
+        step = (self.mean - old_mean) / self.sigma
+
+        B, D = self._eigen()
+        inverse_sqrt = B @ np.diag(1 / D) @ B.T
+
+        self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * inverse_sqrt @ step
+        ps_norm = np.linalg.norm(self.ps) / np.sqrt(1 - (1 - self.cs) ** (2 * (self.generation + 1)))
+        hsig = ps_norm / self.chi_n < 1.4 + 2 / (n + 1)
+
+        self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * step
+
+        steps = (selected - old_mean) / self.sigma
+        self.C = (
+            (1 - self.c1 - self.cmu) * self.C
+            + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+            + self.cmu * (steps.T * self.weights) @ steps
+        )
+        self.C = (self.C + self.C.T) / 2
+
+        self.sigma *= np.exp(self.cs / self.damps * (np.linalg.norm(self.ps) / self.chi_n - 1))
+        self.generation += 1
+
+    def get_state(self):
+        return {
+            'mean': self.mean.tolist(),
+            'sigma': self.sigma,
+            'population_size': self.population_size,
+            'seed': self.seed,
+            'generation': self.generation,
+            'pc': self.pc.tolist(),
+            'ps': self.ps.tolist(),
+            'C': self.C.tolist()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        cma = cls(state['mean'], state['sigma'], state['population_size'], state['seed'])
+        cma.generation = state['generation']
+        cma.pc = np.array(state['pc'])
+        cma.ps = np.array(state['ps'])
+        cma.C = np.array(state['C'])
+        return cma
+
+
+def default_parameters():
+    strategy = MemoryStrategy(debug=False, memory_file=None, transposition_table_size=0, weights_file=None)
+    return strategy.get_phase_weights()
+
+
+def decode(x, initial):
+    x = np.asarray(x, dtype=float)
+    phase_weights = {}
+
+    for p, phase in enumerate(GAME_PHASES):
+        phase_weights[phase] = {}
+        for f, feature in enumerate(PHASE_FEATURES):
+            k = p * len(PHASE_FEATURES) + f
+            phase_weights[phase][feature] = initial['phase_weights'][phase][feature] * x[k]
+
+    exponents = [
+        np.log2(cutoff / CUTOFF_BASE_TILE) * scale
+        for cutoff, scale in zip(initial['phase_cutoffs'], x[-2:])
+    ]
+    phase_cutoffs = sorted(CUTOFF_BASE_TILE * 2 ** exponent for exponent in exponents)
+
+    return {'phase_weights': phase_weights, 'phase_cutoffs': phase_cutoffs}
+
+
+def _init_worker(engine):
+    global _worker_strategy
+    _worker_strategy = MemoryStrategy(debug=False, memory_file=None, engine=engine, weights_file=None)
+
+
+def _play_candidate_game(parameters, seed, depth, max_moves):
+    _worker_strategy.set_phase_weights(parameters['phase_weights'], parameters['phase_cutoffs'])
+    return play_headless_game(_worker_strategy, seed, depth=depth, max_moves=max_moves)['score']
+
+
+def evaluate_candidates(executor, candidates, seeds, depth, max_moves):
+    tasks = [(parameters, seed) for parameters in candidates for seed in seeds]
+    scores = list(executor.map(
+        _play_candidate_game,
+        [parameters for parameters, _ in tasks], [seed for _, seed in tasks],
+        [depth] * len(tasks), [max_moves] * len(tasks)
+    ))
+    return [float(np.mean(scores[k * len(seeds):(k + 1) * len(seeds)])) for k in range(len(candidates))]
+
+
+def save_json(path, data):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def tune(output=MEMORY_WEIGHTS_FILE, checkpoint='./tuning/checkpoint.json', generations=20, games=8, workers=1,
+         sigma=0.3, population_size=None, seed=0, depth=None, max_moves=None, engine='numpy', resume=False,
+         finalists=3, validation_games=32):
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint, 'r') as f:
+            state = json.load(f)
+        cma = CMAES.from_state(state['cma'])
+        initial = state['initial']
+        top = state.get('top', [])
+        history = state['history']
+        print(f'Resuming from generation {cma.generation}')
+    else:
+        initial = default_parameters()
+        cma = CMAES(np.ones(PARAMETER_COUNT), sigma, population_size, seed)
+        top = []
+        history = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine,)) as executor:
+        while cma.generation < generations:
+            start_time = time.perf_counter()
+
+            seeds = [seed + cma.generation * games + k for k in range(games)]
+            samples = cma.ask()
+            candidates = [decode(x, initial) for x in [cma.mean] + list(samples)]
+            scores = evaluate_candidates(executor, candidates, seeds, depth, max_moves)
+
+            mean_score = scores[0]
+            sample_scores = scores[1:]
+
+            top.extend(
+                {'score': score, 'generation': cma.generation + 1, **parameters}
+                for score, parameters in zip(scores, candidates)
+            )
+            top = sorted(top, key=lambda candidate: candidate['score'], reverse=True)[:finalists]
+
+            cma.tell(samples, [-score for score in sample_scores])
+
+            history.append({
+                'generation': cma.generation,
+                'mean_score': mean_score,
+                'best_sample_score': max(sample_scores),
+                'sigma': cma.sigma,
+                'elapsed_sec': time.perf_counter() - start_time
+            })
+            save_json(checkpoint, {'cma': cma.get_state(), 'initial': initial, 'top': top, 'history': history})
+
+            print(f'Generation {cma.generation}: mean {mean_score:.0f}, best sample {max(sample_scores):.0f}, '
+                  f'sigma {cma.sigma:.3f}, {history[-1]["elapsed_sec"]:.1f} sec')
+
+        names = ['final mean', 'hand-picked'] + [
+            f'top {k + 1} (generation {candidate["generation"]})' for k, candidate in enumerate(top)
+        ]
+        candidates = [decode(cma.mean, initial), initial] + [
+            {k: candidate[k] for k in ('phase_weights', 'phase_cutoffs')} for candidate in top
+        ]
+        seeds = [seed + VALIDATION_SEED_OFFSET + k for k in range(validation_games)]
+        scores = evaluate_candidates(executor, candidates, seeds, depth, max_moves)
+
+    for name, score in zip(names, scores):
+        print(f'Held-out {name}: mean score {score:.0f}')
+
+    chosen = int(np.argmax(scores))
+    save_json(output, candidates[chosen])
+
+    return {'name': names[chosen], 'score': scores[chosen], **candidates[chosen]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune MemoryStrategy phase weights and cutoffs with CMA-ES')
+    parser.add_argument(
+        '-g', '--generations', type=int, default=20,
+        help='CMA-ES generations to run, counting resumed ones (default: 20)')
+    parser.add_argument(
+        '-n', '--games', type=int, default=8,
+        help='Seeded games per candidate; the candidates of a generation share seeds, which change every '
+             'generation (default: 8)')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=os.cpu_count() or 1,
+        help='Worker processes (default: CPU count)')
+    parser.add_argument(
+        '--population', type=int, default=None,
+        help='Candidates per generation (default: 4 + 3 ln(parameters))')
+    parser.add_argument(
+        '--sigma', type=float, default=0.3,
+        help='Initial step size, relative to the hand-picked values (default: 0.3)')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed for sampling and for the games (default: 0)')
+    parser.add_argument(
+        '--depth', type=int, default=None,
+        help="Fixed search depth (default: the solver's adaptive depth)")
+    parser.add_argument(
+        '--max-moves', type=int, default=None,
+        help='Stop each game after this many moves (default: play to the end)')
+    parser.add_argument(
+        '--finalists', type=int, default=3,
+        help='Highest scoring candidates re-scored on held-out seeds after the last generation (default: 3)')
+    parser.add_argument(
+        '--validation-games', type=int, default=32,
+        help='Held-out games per finalist (default: 32)')
+    parser.add_argument(
+        '-e', '--engine', choices=ENGINES, default='numpy',
+        help='Move simulation engine (default: numpy)')
+    parser.add_argument(
+        '-o', '--output', default=MEMORY_WEIGHTS_FILE,
+        help=f'Weights file for the finalist with the best held-out score (default: {MEMORY_WEIGHTS_FILE})')
+    parser.add_argument(
+        '--checkpoint', default='./tuning/checkpoint.json',
+        help='Checkpoint written after every generation (default: ./tuning/checkpoint.json)')
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='Continue from the checkpoint')
+
+    args = parser.parse_args()
+
+    result = tune(
+        output=args.output, checkpoint=args.checkpoint, generations=args.generations, games=args.games,
+        workers=args.workers, sigma=args.sigma, population_size=args.population, seed=args.seed,
+        depth=args.depth, max_moves=args.max_moves, engine=args.engine, resume=args.resume,
+        finalists=args.finalists, validation_games=args.validation_games
+    )
+
+    print(f'\nSaved the {result["name"]} weights (held-out mean score {result["score"]:.0f}) to {args.output}')
+
+
+if __name__ == '__main__':
+    main()